@@ -1,8 +1,6 @@
 from typing import Any, Optional
 import sys
 import os
-from datetime import datetime
-from difflib import SequenceMatcher
 from pathlib import Path
 from toon_format import encode
 
@@ -13,13 +11,20 @@ os.chdir(str(PROJECT_ROOT))
 
 
 
+from categorization import assign_category, filtered_movement_ids, unassign_category
+from category_model import suggest_categories
+from categorization_rules import apply_rules, create_rule, delete_rule, list_rules
 from database_connection import DatabaseConnection
+from rollups import fetch_category_report_range, fetch_monthly_category_totals
+from similarity import find_similar, find_similar_batch, find_similar_reference
+from transaction_queries import month_range
+from transactions_service import load_categories, load_category_levels, load_transactions
 from fastmcp import FastMCP
 
 mcp = FastMCP("cuentas")
 
 def get_db_connection():
-    """Creates and returns a database connection, and connects."""
+    """Creates a database connection and checks out a pooled SQLite connection for it."""
     db = DatabaseConnection()
     db.connect()
     return db
@@ -28,53 +33,14 @@ def get_db_connection():
 def get_transactions(month: str = None, category_id: Optional[int] = None) -> Any:
     """
     Obtiene las transacciones, opcionalmente filtradas por mes (formato 'YYYY-MM') y/o ID de categoría.
-    Esta función replica la lógica de consulta de la ruta principal de la aplicación web.
+    Usa el mismo servicio (y la misma caché) que la ruta principal de la aplicación web.
     :param month: El mes para filtrar las transacciones (ej. '2025-07').
     :param category_id: El ID de la categoría para filtrar las transacciones.
     :return: Una lista de transacciones con sus categorías.
     """
     db = get_db_connection()
     try:
-        query = """
-            SELECT
-                m.id, m.fecha, m.fecha_valor, m.descripcion, m.importe, m.saldo,
-                c.id as category_id, c.name as category_name, c.description as category_description
-            FROM movimientos m
-            LEFT JOIN movements_categories mc ON m.id = mc.movement_id
-            LEFT JOIN categories c ON mc.category_id = c.id
-        """
-        where_clauses = []
-        where_params = []
-        if month:
-            where_clauses.append("strftime('%Y-%m', m.fecha) = ?")
-            where_params.append(month)
-        if category_id and category_id > 0:
-            where_clauses.append("c.id = ?")
-            where_params.append(category_id)
-
-        if where_clauses:
-            query += " WHERE " + " AND ".join(where_clauses)
-            # This GROUP BY is in the original app.py logic inside the if-clause
-            query += " GROUP BY m.id, c.id"
-
-        query += " ORDER BY m.fecha DESC, m.id DESC"
-
-        transactions_data = db.execute_query(query, where_params)
-
-        transactions_dict = {}
-        for row in transactions_data:
-            trans_id = row[0]
-            if trans_id not in transactions_dict:
-                transactions_dict[trans_id] = {
-                    'id': row[0], 'fecha': row[1], 'fecha_valor': row[2],
-                    'descripcion': row[3], 'importe': row[4], 'saldo': row[5],
-                    'categories': []
-                }
-            if row[6] is not None:
-                transactions_dict[trans_id]['categories'].append({
-                    'id': row[6], 'name': row[7], 'description': row[8]
-                })
-        return encode(list(transactions_dict.values()))
+        return encode(load_transactions(db, month, category_id))
     finally:
         db.close()
 
@@ -87,26 +53,52 @@ def get_category_report(month: str = None) -> Any:
     """
     db = get_db_connection()
     try:
-        query = """
-            SELECT
-                c.id, c.name, SUM(m.importe) as total
-            FROM movimientos m
-            LEFT JOIN movements_categories mc ON m.id = mc.movement_id
-            LEFT JOIN categories c ON mc.category_id = c.id
-        """
-        where_clauses = []
-        where_params = []
         if month:
-            where_clauses.append("strftime('%Y-%m', m.fecha) = ?")
-            where_params.append(month)
-
-        if where_clauses:
-            query += " WHERE " + " AND ".join(where_clauses)
+            # Valida el formato del mes
+            month_range(month)
+        # Los totales salen de la tabla resumen mensual en lugar de recorrer los movimientos
+        categories_data = fetch_monthly_category_totals(db, month)
+        return encode([
+            {'id': category_id, 'name': name, 'total': round(received - spent, 2)}
+            for category_id, name, spent, received, _ in categories_data
+        ])
+    finally:
+        db.close()
 
-        query += " GROUP BY c.id ORDER BY c.name"
+@mcp.tool()
+def get_category_report_range(
+    start_month: Optional[str] = None,
+    end_month: Optional[str] = None,
+    granularity: str = 'month',
+    category_id: Optional[int] = None
+) -> Any:
+    """
+    Obtiene la serie temporal de totales por categoría en una sola llamada, en lugar de pedir el informe mes a mes.
+    :param start_month: Primer mes incluido (formato 'YYYY-MM'). Por defecto, desde el primer movimiento.
+    :param end_month: Último mes incluido (formato 'YYYY-MM'). Por defecto, hasta el último movimiento.
+    :param granularity: Agrupación temporal: 'month', 'quarter' (periodos '2025-Q3') o 'year'.
+    :param category_id: El ID de la categoría para filtrar (0 para los movimientos sin categoría).
+    :return: Una lista con periodo, categoría, gastado, ingresado, total neto y número de movimientos.
+    """
+    db = get_db_connection()
+    try:
+        return encode(fetch_category_report_range(db, start_month, end_month, granularity, category_id))
+    finally:
+        db.close()
 
-        categories_data = db.execute_query(query, where_params)
-        return encode([{'id': row[0], 'name': row[1], 'total': row[2]} for row in categories_data])
+@mcp.tool()
+def get_category_report_by_level(month: str = None, level: int = 1) -> Any:
+    """
+    Obtiene los totales por categoría agregados por nivel de la jerarquía de nombres ('gastos/casa' es hija de 'gastos').
+    :param month: El mes para filtrar las transacciones (ej. '2025-07').
+    :param level: Nivel de agregación: 1 suma todo bajo 'gastos', 2 bajo 'gastos/casa', etc.
+    :return: Una lista con ruta de la categoría, gastado, ingresado y total neto.
+    """
+    db = get_db_connection()
+    try:
+        return encode(load_category_levels(db, month, level))
+    except ValueError as e:
+        return encode({"success": False, "message": str(e)})
     finally:
         db.close()
 
@@ -118,10 +110,7 @@ def get_categories() -> Any:
     """
     db = get_db_connection()
     try:
-        categories = db.select('categories')
-        categories_list = [{'id': c[0], 'name': c[1], 'description': c[2]} for c in categories]
-        categories_list.sort(key=lambda c: c['name'].lower())
-        return encode(categories_list)
+        return encode(load_categories(db))
     finally:
         db.close()
 
@@ -179,34 +168,48 @@ def delete_category(category_id: int) -> Any:
 @mcp.tool()
 def assign_category_to_transactions(transaction_ids: list[int], category_id: int) -> Any:
     """
-    Asigna una categoría a una o varias transacciones.
+    Asigna una categoría a una o varias transacciones en una sola transacción de base de datos.
     :param transaction_ids: La lista de IDs de las transacciones.
     :param category_id: El ID de la categoría a asignar.
     :return: Un diccionario con el resultado de la operación.
     """
     db = get_db_connection()
     try:
-        # Evitar duplicados: obtener las asignaciones existentes
-        placeholders = ','.join(['?'] * len(transaction_ids))
-        query = f"""SELECT movement_id FROM movements_categories 
-                   WHERE movement_id IN ({placeholders}) AND category_id = ?"""
-        existing = db.execute_query(query, transaction_ids + [category_id])
-        existing_ids = {row[0] for row in existing}
-
-        # Filtrar las transacciones que ya tienen la categoría asignada
-        new_transaction_ids = [tid for tid in transaction_ids if tid not in existing_ids]
-
-        if not new_transaction_ids:
-            return {"success": False, "message": "La categoría ya está asignada a todas las transacciones seleccionadas."}
+        # Las transacciones que ya tienen la categoría se omiten (índice único movement_id, category_id)
+        try:
+            result = assign_category(db, transaction_ids, category_id)
+        except ValueError:
+            return encode({"success": False, "message": f"No existe la categoría con ID {category_id}."})
+
+        missing = f" No existen las transacciones con ID {result['missing']}." if result['missing'] else ""
+        if result['assigned'] == 0:
+            if result['missing'] and len(result['missing']) == len(set(transaction_ids)):
+                return encode({"success": False, "message": missing.strip()})
+            return encode({"success": False, "message": "La categoría ya está asignada a todas las transacciones seleccionadas." + missing})
+        return encode({"success": True, "message": f"Categoría asignada a {result['assigned']} transacciones." + missing})
+    finally:
+        db.close()
 
-        # Insertar las nuevas asignaciones
-        for transaction_id in new_transaction_ids:
-            db.insert('movements_categories', {
-                'movement_id': transaction_id,
-                'category_id': category_id
-            })
-        
-        return encode({"success": True, "message": f"Categoría asignada a {len(new_transaction_ids)} transacciones."})
+@mcp.tool()
+def assign_category_to_filtered_transactions(category_id: int, month: Optional[str] = None, filter_category_id: Optional[int] = None) -> Any:
+    """
+    Asigna una categoría a todas las transacciones que cumplen un filtro, sin tener que listar sus IDs.
+    :param category_id: El ID de la categoría a asignar.
+    :param month: Mes en formato 'YYYY-MM' (opcional).
+    :param filter_category_id: Solo las transacciones que ya tienen esta categoría (opcional).
+    :return: Un diccionario con el resultado de la operación.
+    """
+    db = get_db_connection()
+    try:
+        try:
+            movement_ids = filtered_movement_ids(db, month, filter_category_id)
+            result = assign_category(db, movement_ids, category_id)
+        except ValueError as e:
+            return encode({"success": False, "message": str(e)})
+        return encode({
+            "success": True,
+            "message": f"Categoría asignada a {result['assigned']} de {len(movement_ids)} transacciones."
+        })
     finally:
         db.close()
 
@@ -220,16 +223,8 @@ def remove_category_from_transactions(transaction_ids: list[int], category_id: i
     """
     db = get_db_connection()
     try:
-        placeholders = ','.join(['?'] * len(transaction_ids))
-        where_clause = f"movement_id IN ({placeholders}) AND category_id = ?"
-        params = transaction_ids + [category_id]
-        
-        rows_affected = db.delete(
-            'movements_categories',
-            where_clause,
-            params
-        )
-        
+        rows_affected = unassign_category(db, transaction_ids, category_id)
+
         if rows_affected > 0:
             return encode({"success": True, "message": f"Categoría eliminada de {rows_affected} transacciones."})
         else:
@@ -238,7 +233,7 @@ def remove_category_from_transactions(transaction_ids: list[int], category_id: i
         db.close()
 
 @mcp.tool()
-def find_similar_transactions(description: str, amount: float, date: str, threshold: float = 0.8, top_k: Optional[int] = None) -> Any:
+def find_similar_transactions(description: str, amount: float, date: str, threshold: float = 0.8, top_k: Optional[int] = None, mode: str = 'indexed') -> Any:
     """
     Encuentra transacciones similares basadas en la descripción, el importe y la fecha.
     Busca transacciones en el último año con descripciones y valores similares.
@@ -249,75 +244,138 @@ def find_similar_transactions(description: str, amount: float, date: str, thresh
     :param date: La fecha de la transacción a comparar (formato 'YYYY-MM-DD').
     :param threshold: El umbral de similitud para la descripción (default: 0.8). No se tiene en cuenta con top_k.
     :param top_k: Numero de transacciones a devolver (opcional, si se especifica, limita el número de resultados).
+    :param mode: 'indexed' (por defecto) usa el índice en memoria y solo puntúa las transacciones que pueden
+                 entrar en el resultado; 'reference' puntúa todas las del último año, para comparar resultados.
     :return: Una lista de transacciones similares con sus categorías.
     """
     db = get_db_connection()
     try:
-        # Obtener todas las transacciones del último año con sus categorías
-        query = """
-            SELECT
-                m.id, m.fecha, m.descripcion, m.importe,
-                c.id as category_id, c.name as category_name
-            FROM movimientos m
-            LEFT JOIN movements_categories mc ON m.id = mc.movement_id
-            LEFT JOIN categories c ON mc.category_id = c.id
-            WHERE m.fecha BETWEEN date(?, '-1 year') AND ?
-        """
-        transactions_data = db.execute_query(query, (date, date))
-
-        # Agrupar transacciones y sus categorías
-        transactions_dict = {}
-        for row in transactions_data:
-            trans_id = row[0]
-            if trans_id not in transactions_dict:
-                transactions_dict[trans_id] = {
-                    'id': row[0],
-                    'fecha': row[1],
-                    'descripcion': row[2],
-                    'importe': row[3],
-                    'categories': []
-                }
-            if row[4] is not None:
-                transactions_dict[trans_id]['categories'].append({
-                    'id': row[4],
-                    'name': row[5]
-                })
-
-        transactions = list(transactions_dict.values())
-        
-        similar_transactions = []
-        for trans in transactions:
-            # Calcular la similitud de la descripción
-            desc_similarity = SequenceMatcher(None, description.lower(), trans['descripcion'].lower()).ratio()
-
-            # Calcular la similitud del importe
-            amount_similarity = 1 - abs(amount - trans['importe']) / max(abs(amount), abs(trans['importe']))
+        if mode == 'reference':
+            similar_transactions = find_similar_reference(db, description, amount, date, threshold, top_k)
+        elif mode == 'indexed':
+            similar_transactions = find_similar(db, description, amount, date, threshold, top_k)
+        else:
+            raise ValueError(f"Modo desconocido '{mode}'. Usa 'indexed' o 'reference'.")
+        return encode(similar_transactions)
+    finally:
+        db.close()
 
-            # Calcular la similitud de la fecha
-            trans_date = datetime.strptime(trans['fecha'], '%Y-%m-%d')
-            search_date = datetime.strptime(date, '%Y-%m-%d')
-            
-            day_of_week_similarity = 1 if trans_date.weekday() == search_date.weekday() else 0
-            day_of_month_similarity = 1 - abs(trans_date.day - search_date.day) / 30
-            day_of_year_similarity = 1 - abs(trans_date.timetuple().tm_yday - search_date.timetuple().tm_yday) / 365
-            
-            date_similarity = (day_of_week_similarity + day_of_month_similarity + day_of_year_similarity) / 3
+@mcp.tool()
+def find_similar_transactions_batch(
+    probes: Optional[list[dict]] = None,
+    transaction_ids: Optional[list[int]] = None,
+    threshold: float = 0.8,
+    top_k: Optional[int] = 5
+) -> Any:
+    """
+    Busca transacciones similares para muchas transacciones en una sola llamada, por ejemplo
+    para categorizar todos los movimientos de una subida. Usa el mismo criterio que
+    find_similar_transactions.
+    :param probes: Lista de transacciones a comparar, cada una con 'description', 'amount' y 'date' ('YYYY-MM-DD').
+    :param transaction_ids: Lista de IDs de transacciones existentes a comparar; la propia transacción no
+                            aparece entre sus resultados.
+    :param threshold: El umbral de similitud (default: 0.8). No se tiene en cuenta con top_k.
+    :param top_k: Numero de transacciones similares a devolver por cada una (default: 5).
+    :return: Una lista con, para cada transacción de entrada y en el mismo orden, sus transacciones similares
+             ('matches') con sus categorías.
+    """
+    db = get_db_connection()
+    try:
+        probe_tuples = [(p['description'], float(p['amount']), p['date']) for p in probes or []]
+        return encode(find_similar_batch(db, probe_tuples, transaction_ids, threshold, top_k))
+    finally:
+        db.close()
 
-            # Calcular la puntuación de similitud total
-            total_similarity = (desc_similarity + amount_similarity + date_similarity) / 3
+@mcp.tool()
+def get_categorization_rules() -> Any:
+    """
+    Obtiene las reglas de categorización automática, en el orden en que se aplican.
+    :return: Una lista de reglas con su categoría.
+    """
+    db = get_db_connection()
+    try:
+        return encode(list_rules(db))
+    finally:
+        db.close()
 
-            trans['similarity'] = total_similarity
-            similar_transactions.append(trans)
+@mcp.tool()
+def create_categorization_rule(
+    category_id: int,
+    pattern: str,
+    is_regex: bool = False,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    sign: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    priority: int = 0
+) -> Any:
+    """
+    Crea una regla que asigna una categoría automáticamente a las transacciones sin categoría.
+    Las reglas se aplican al subir un extracto y con apply_categorization_rules; la primera
+    regla que coincide (por prioridad y luego por ID) decide la categoría.
+    :param category_id: El ID de la categoría a asignar.
+    :param pattern: Texto a buscar en la descripción (sin distinguir mayúsculas).
+    :param is_regex: Si es True, pattern es una expresión regular.
+    :param min_amount: Importe mínimo en valor absoluto (opcional).
+    :param max_amount: Importe máximo en valor absoluto (opcional).
+    :param sign: 'expense' para gastos o 'income' para ingresos (opcional).
+    :param start_date: Primera fecha en la que aplica la regla, formato 'YYYY-MM-DD' (opcional).
+    :param end_date: Última fecha en la que aplica la regla, formato 'YYYY-MM-DD' (opcional).
+    :param priority: Las reglas con menor prioridad se prueban antes (default: 0).
+    :return: Un diccionario con el resultado de la operación.
+    """
+    db = get_db_connection()
+    try:
+        rule_id = create_rule(db, category_id, pattern, is_regex, min_amount, max_amount,
+                              sign, start_date, end_date, priority)
+        if rule_id is None:
+            return encode({"success": False, "message": "No se pudo crear la regla."})
+        return encode({"success": True, "message": f"Regla creada con ID {rule_id}."})
+    finally:
+        db.close()
 
-        # Ordenar por similitud descendente
-        similar_transactions.sort(key=lambda x: x['similarity'], reverse=True)
+@mcp.tool()
+def delete_categorization_rule(rule_id: int) -> Any:
+    """
+    Elimina una regla de categorización. Las categorías ya asignadas no cambian.
+    :param rule_id: El ID de la regla a eliminar.
+    :return: Un diccionario con el resultado de la operación.
+    """
+    db = get_db_connection()
+    try:
+        if delete_rule(db, rule_id) > 0:
+            return encode({"success": True, "message": f"Regla con ID {rule_id} eliminada."})
+        return encode({"success": False, "message": f"No se encontró la regla con ID {rule_id}."})
+    finally:
+        db.close()
 
-        if top_k is not None:
-            similar_transactions = similar_transactions[:int(top_k)]
-        else:
-            similar_transactions = [x for x in similar_transactions if x['similarity'] >= threshold]
+@mcp.tool()
+def apply_categorization_rules(dry_run: bool = False) -> Any:
+    """
+    Aplica las reglas de categorización a todas las transacciones que no tienen categoría.
+    :param dry_run: Si es True, solo cuenta las coincidencias sin asignar categorías.
+    :return: Las transacciones revisadas, las categorizadas y cuántas coincidieron con cada regla.
+    """
+    db = get_db_connection()
+    try:
+        return encode(apply_rules(db, dry_run=dry_run))
+    finally:
+        db.close()
 
-        return encode(similar_transactions)
+@mcp.tool()
+def suggest_transaction_categories(transaction_ids: Optional[list[int]] = None, top_n: int = 3) -> Any:
+    """
+    Sugiere categorías para transacciones con un modelo aprendido de las categorías ya asignadas
+    (naive Bayes sobre n-gramas de la descripción). El modelo se actualiza con las asignaciones nuevas
+    antes de sugerir.
+    :param transaction_ids: La lista de IDs de las transacciones (opcional; si no se indica, todas las que no tienen categoría).
+    :param top_n: Número de categorías sugeridas por transacción (default: 3).
+    :return: Una lista de transacciones con sus categorías sugeridas y su probabilidad.
+    """
+    db = get_db_connection()
+    try:
+        return encode(suggest_categories(db, transaction_ids, top_n))
     finally:
         db.close()
 
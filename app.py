@@ -1,22 +1,181 @@
 from fastapi import FastAPI, Request, Form, Depends, HTTPException, UploadFile, File
-from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, Response, StreamingResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.exception_handlers import HTTPException as StarletteHTTPException
 from typing import List, Optional
-from database_connection import DatabaseConnection
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from categorization import assign_category, filtered_movement_ids, unassign_category
+from category_model import suggest_categories
+from categorization_rules import apply_rules, create_rule, delete_rule, list_rules
+from database_connection import AsyncDatabaseConnection, DatabaseConnection, call_with_connection
+from batch_import import expand_sources, parse_statement_file, write_batch
+from import_jobs import FINISHED_STATUSES, create_job, fail_interrupted_jobs, get_job, list_jobs, run_import_job, update_job
+from rollups import fetch_category_report_range
+from transaction_queries import DEFAULT_PAGE_SIZE, month_range
+from transactions_service import (
+    SUMMARY_FIELDS, TRANSACTION_FIELDS, load_categories, load_summary, load_summary_columns,
+    load_transactions_columns, load_transactions_page, select_fields
+)
 import uvicorn
 from pydantic import BaseModel
 from datetime import datetime
-import pandas as pd
-import io
+import asyncio
+import hashlib
+import json
+import multiprocessing
 import os
+import shutil
+import tempfile
+import threading
+import uuid
 
-app = FastAPI(title="Transaction Categorizer")
+# Excel parsing is CPU-bound, so imports run as background jobs in worker processes
+parse_executor = None
+# Uploads submit jobs from several database threads at once; only one pool may be created
+parse_executor_lock = threading.Lock()
+
+# Seconds between progress checks of an import job streamed to the browser
+JOB_POLL_INTERVAL = 0.5
+
+# Uploads are spooled to disk in chunks of this size, up to MAX_UPLOAD_SIZE_MB
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_SIZE = int(os.environ.get("MAX_UPLOAD_SIZE_MB", "200")) * 1024 * 1024
+
+def get_parse_executor():
+    global parse_executor
+    with parse_executor_lock:
+        if parse_executor is None:
+            parse_executor = ProcessPoolExecutor(
+                max_workers=int(os.environ.get("EXCEL_PARSE_WORKERS", "2")),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return parse_executor
+
+def _job_finished(job_id, future):
+    # run_import_job records its own errors; this only catches a worker process dying
+    if future.cancelled() or future.exception() is not None:
+        print(f"Import job {job_id} did not finish: {future.exception() if not future.cancelled() else 'cancelled'}")
+        with DatabaseConnection() as db:
+            update_job(db, job_id, status='failed', message="The import was interrupted",
+                       finished_at=datetime.now().isoformat(timespec='seconds'))
+
+def submit_import_job(db, path, filename):
+    """Queue the import of a spooled file; returns the job id straight away."""
+    job_id = create_job(db, filename)
+    future = get_parse_executor().submit(run_import_job, job_id, path)
+    future.add_done_callback(lambda f: _job_finished(job_id, f))
+    return job_id
+
+# Batch imports run in the event loop and only hand the parsing to the workers;
+# the tasks are kept referenced until they finish
+batch_import_tasks = set()
+
+async def run_batch_import_job(job_id, uploads, spool_dir):
+    """Parse spooled files (and ZIP members) in parallel, then merge and write them at once."""
+    now = lambda: datetime.now().isoformat(timespec='seconds')
+    # Connections are only held for each update, not while the files are parsed
+    try:
+        await call_with_connection(update_job, job_id, status='running', started_at=now())
+        try:
+            loop = asyncio.get_running_loop()
+            sources = await loop.run_in_executor(None, expand_sources, uploads, spool_dir)
+            futures = {
+                asyncio.ensure_future(loop.run_in_executor(get_parse_executor(), parse_statement_file, path)): name
+                for name, path in sources
+            }
+
+            frames, failed, error_count, rows = [], [], 0, 0
+            pending = set(futures)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        movements, errors = future.result()
+                    except ValueError as e:
+                        # One unreadable file doesn't fail the batch; it is named in the job message
+                        failed.append(f"{futures[future]}: {e}")
+                        continue
+                    frames.append(movements)
+                    error_count += errors
+                    rows += len(movements) + errors
+                await call_with_connection(update_job, job_id, rows_processed=rows, errors=error_count)
+
+            if not frames:
+                raise ValueError(failed[0] if len(failed) == 1 else f"None of the {len(sources)} files could be read")
+            result = await call_with_connection(write_batch, frames)
+            await call_with_connection(
+                update_job, job_id, status='done', inserted=result['inserted'], duplicates=result['duplicates'],
+                categorized=result['categorized'], finished_at=now(),
+                message=f"{len(failed)} of {len(sources)} files could not be read: {'; '.join(sorted(failed))}" if failed else None
+            )
+        except ValueError as e:
+            await call_with_connection(update_job, job_id, status='failed', message=f"File processing error: {e}",
+                                       finished_at=now())
+        except Exception as e:
+            print(f"Unexpected error importing files: {e}")
+            await call_with_connection(update_job, job_id, status='failed', finished_at=now(),
+                                       message="An unexpected error occurred while processing the files")
+    finally:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Jobs of a previous run can't be resumed: their spooled files are gone
+    with DatabaseConnection() as db:
+        fail_interrupted_jobs(db)
+    yield
+    if parse_executor is not None:
+        parse_executor.shutdown(cancel_futures=True)
+
+app = FastAPI(title="Transaction Categorizer", lifespan=lifespan)
 
 # Mount static files directory
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+# Appended to asset URLs so browsers and nginx can cache them until they change
+STATIC_VERSION = hashlib.sha1(
+    str(sorted((path, os.path.getmtime(os.path.join(root, path)))
+               for root, _, files in os.walk("static") for path in files)).encode()
+).hexdigest()[:12]
+
+# GET pages and endpoints whose response only depends on the query string and on the
+# data tracked by data_generation, answered with 304 when the client is up to date
+CONDITIONAL_PATHS = {
+    "/", "/categories", "/api/transactions", "/api/summary", "/api/reports/categories",
+    "/api/v1/transactions", "/api/v1/summary",
+}
+
+# Part of every ETag, so responses rendered by a previous run (older templates) don't match
+ETAG_SALT = uuid.uuid4().hex
+
+def data_etag(generation, request):
+    key = f"{ETAG_SALT}:{generation}:{request.url.path}?{request.url.query}"
+    return '"' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
+
+def etag_matches(if_none_match, etag):
+    # nginx turns ETags into weak ones (W/"...") when it gzips a response
+    tags = [tag.strip() for tag in (if_none_match or "").split(",")]
+    return "*" in tags or any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+
+@app.middleware("http")
+async def conditional_get(request: Request, call_next):
+    if request.method != "GET" or request.url.path not in CONDITIONAL_PATHS:
+        return await call_next(request)
+
+    generation = await call_with_connection(DatabaseConnection.write_version)
+    if generation is None:
+        return await call_next(request)
+
+    headers = {"ETag": data_etag(generation, request), "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    response = await call_next(request)
+    if response.status_code == 200:
+        response.headers.update(headers)
+    return response
+
 # Serve test file for development
 @app.get("/test-ajax", response_class=HTMLResponse)
 async def test_ajax(request: Request):
@@ -26,6 +185,7 @@ async def test_ajax(request: Request):
 
 # Templates directory
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["static_version"] = STATIC_VERSION
 
 # Custom error handler
 @app.exception_handler(StarletteHTTPException)
@@ -70,229 +230,184 @@ class Transaction(BaseModel):
     saldo: float
     categories: List[Category] = []
 
-# Database dependency
-def get_db():
-    db = DatabaseConnection()
-    db.connect()
-    try:
-        yield db
-    finally:
-        db.close()
+class CategorizationRule(BaseModel):
+    category_id: int
+    pattern: str
+    is_regex: bool = False
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    sign: Optional[str] = None
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    priority: int = 0
 
-# Function to process Excel file
-def process_excel_file(file_content: bytes):
-    """
-    Process uploaded Excel file and return DataFrame
-    """
-    try:
-        # Read Excel file from bytes
-        df_dict = pd.read_excel(io.BytesIO(file_content), sheet_name=None)
-        
-        # Try to find the correct sheet
-        sheet_name = None
-        if 'Listado' in df_dict:
-            sheet_name = 'Listado'
-        elif len(df_dict) == 1:
-            # If there's only one sheet, use it
-            sheet_name = list(df_dict.keys())[0]
-        else:
-            # Try to find a sheet with data
-            for name, sheet_df in df_dict.items():
-                if not sheet_df.empty:
-                    sheet_name = name
-                    break
-        
-        if sheet_name is None:
-            raise ValueError("No valid sheet found in the Excel file")
-        
-        df = df_dict[sheet_name]
-        
-        # Try different approaches to find the header row
-        header_row = None
-        
-        print(f"Looking for header row in {len(df)} rows...")
-        
-        # First, try the original approach (row 5 for euskera format)
-        if len(df) > 5:
-            potential_headers = df.iloc[5]
-            headers_str = ' '.join([str(cell).lower() for cell in potential_headers if pd.notna(cell)])
-            print(f"Row 5 headers: {headers_str}")
-            if any(col in headers_str for col in ['data', 'azalpena', 'balio-data']):
-                header_row = 5
-                print("Found euskera headers in row 5")
-        
-        # If not found, look for Spanish headers in the first few rows
-        if header_row is None:
-            for i in range(min(10, len(df))):  # Check first 10 rows
-                row = df.iloc[i]
-                row_str = ' '.join([str(cell).lower() for cell in row if pd.notna(cell)])
-                print(f"Row {i}: {row_str}")
-                if any(col in row_str for col in ['fecha', 'concepto', 'importe', 'saldo']):
-                    header_row = i
-                    print(f"Found spanish headers in row {i}")
-                    break
-        
-        if header_row is None:
-            raise ValueError("Could not find header row with expected columns")
-        
-        # Set column names and data
-        columns = df.iloc[header_row]
-        df.columns = columns
-        df = df.iloc[header_row + 1:]
-        
-        # Remove rows with all NaN values
-        df = df.dropna(how='all')
-        
-        # Reset the index
-        df.reset_index(drop=True, inplace=True)
-        
-        # Validate that we have the minimum required columns and determine format
-        required_columns_euskera = ['data', 'azalpena', 'balio-data', 'eragiketaren zenbatekoa', 'saldoa']
-        required_columns_spanish = ['fecha', 'concepto', 'fecha valor', 'importe', 'saldo']
-        
-        # Get column names as strings
-        column_names = [str(col).lower() for col in df.columns if pd.notna(col)]
-        print(f"Final column names: {column_names}")
-        
-        # Check which format we have
-        has_euskera = all(req_col.lower() in column_names for req_col in required_columns_euskera)
-        has_spanish = all(req_col.lower() in column_names for req_col in required_columns_spanish)
-        
-        print(f"Has euskera columns: {has_euskera}")
-        print(f"Has spanish columns: {has_spanish}")
-        
-        if not has_euskera and not has_spanish:
-            available_cols = [str(col) for col in df.columns if pd.notna(col)]
-            raise ValueError(f"Missing expected columns. Found columns: {', '.join(available_cols)}")
-        
-        # Validate we have data rows
-        if len(df) == 0:
-            raise ValueError("No data rows found in the Excel file after processing")
-        
-        format_type = 'euskera' if has_euskera else 'spanish'
-        print(f"Detected format: {format_type}")
-        
-        return df, format_type
-        
-    except Exception as e:
-        print(f"Error processing Excel file: {e}")
-        raise ValueError(f"Error processing Excel file: {str(e)}")
+class BulkCategoryRequest(BaseModel):
+    category_id: int
+    # Either explicit transaction ids, or the transaction list filters to select them
+    transaction_ids: Optional[List[int]] = None
+    month: Optional[str] = None
+    filter_category_id: Optional[int] = None
+
+class SuggestionRequest(BaseModel):
+    transaction_ids: Optional[List[int]] = None
+    top_n: int = 3
+
+# Database dependency (every call runs on the database thread pool instead of the
+# event loop, with a connection from the shared pool checked out only for that call)
+async def get_db():
+    return AsyncDatabaseConnection()
 
 # Routes
 @app.get("/", response_class=HTMLResponse)
-async def index(request: Request, month: Optional[str]= None, category_id: Optional[int] = None, db: DatabaseConnection = Depends(get_db)):
-    # Get all transactions
-    # Get all transactions with their categories in a single query
-    query ="""
-        SELECT 
-            m.id, m.fecha, m.fecha_valor, m.descripcion, m.importe, m.saldo,
-            c.id as category_id, c.name as category_name, c.description as category_description
-        FROM movimientos m
-        LEFT JOIN movements_categories mc ON m.id = mc.movement_id
-        LEFT JOIN categories c ON mc.category_id = c.id
-    """
-
-    where_clauses = []
-    where_params = []
+async def index(
+    request: Request,
+    month: Optional[str] = None,
+    category_id: Optional[int] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    db: AsyncDatabaseConnection = Depends(get_db)
+):
+    # Only the page shell is rendered here: the summary, charts and transactions
+    # are fetched from /api/v1/summary and /api/v1/transactions by the page
     if month:
-        where_clauses.append("strftime('%Y-%m', m.fecha) = ?")
-        where_params.append(month)
-    if category_id and category_id > 0:
-        where_clauses.append("c.id = ?")
-        where_params.append(category_id)
-    if where_clauses:
-        query += " WHERE " + " AND ".join(where_clauses)
-        query += " GROUP BY m.id, c.id"
-    query += " ORDER BY m.fecha DESC, m.id DESC"
-    
-    transactions_data = db.execute_query(query, where_params)
-
-    # Group transactions and their categories
-    transactions_dict = {}
-    for row in transactions_data:
-        trans_id = row[0]
-        if trans_id not in transactions_dict:
-            transactions_dict[trans_id] = {
-                'id': row[0],
-                'fecha': row[1],
-                'fecha_valor': row[2],
-                'descripcion': row[3],
-                'importe': row[4],
-                'saldo': row[5],
-                'categories': []
-            }
-        
-        # Add category if it exists
-        if row[6] is not None:  # category_id
-            transactions_dict[trans_id]['categories'].append({
-                'id': row[6],
-                'name': row[7],
-                'description': row[8]
-            })
-    
-    transactions_list = list(transactions_dict.values())
-    
-    # Calculate totals
-    total_spent = sum(t['importe'] for t in transactions_list if t['importe'] < 0)
-    total_received = sum(t['importe'] for t in transactions_list if t['importe'] > 0)
-    total_difference = total_received + total_spent  # spent is already negative
-    
-    # Calculate totals per category for the chart
-    category_totals = {}
-    category_gains_totals = {}
-    for transaction in transactions_list:
-        if transaction['importe'] < 0:
-            if transaction['categories']:
-                for category in transaction['categories']:
-                    category_name = category['name']
-                    if category_name not in category_totals:
-                        category_totals[category_name] = 0
-                    # Add the absolute value of the expense
-                    category_totals[category_name] += abs(transaction['importe'])
-            else:
-                # Handle transactions with no category
-                if 'Uncategorized' not in category_totals:
-                    category_totals['Uncategorized'] = 0
-                category_totals['Uncategorized'] += abs(transaction['importe'])
-        elif transaction['importe'] > 0:
-            if transaction['categories']:
-                for category in transaction['categories']:
-                    category_name = category['name']
-                    if category_name not in category_gains_totals:
-                        category_gains_totals[category_name] = 0
-                    category_gains_totals[category_name] += transaction['importe']
-            else:
-                # Handle transactions with no category
-                if 'Uncategorized' not in category_gains_totals:
-                    category_gains_totals['Uncategorized'] = 0
-                category_gains_totals['Uncategorized'] += transaction['importe']
-
-    # Get all categories
-    categories = db.select('categories')
-    categories_list = [{'id': c[0], 'name': c[1], 'description': c[2]} for c in categories]
-    # Order categories by name
-    categories_list.sort(key=lambda c: c['name'].lower())
+        try:
+            month_range(month)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    # All categories, ordered by name
+    categories_list = await db.call(load_categories)
     
     return templates.TemplateResponse(
         "index.html", 
         {
             "request": request, 
-            "transactions": transactions_list, 
+            "page_size": page_size,
             "categories": categories_list, 
             "current_year": datetime.now().year, 
             "month": month, 
-            "category_id": category_id,
-            "total_spent": total_spent,
-            "total_received": total_received,
-            "total_difference": total_difference,
-            "category_totals": category_totals,
-            "category_gains_totals": category_gains_totals
+            "category_id": category_id
         }
     )
 
+@app.get("/api/transactions")
+async def list_transactions_page(
+    month: Optional[str] = None,
+    category_id: Optional[int] = None,
+    after_fecha: Optional[str] = None,
+    after_id: Optional[int] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    db: AsyncDatabaseConnection = Depends(get_db)
+):
+    after = (after_fecha, after_id) if after_fecha is not None and after_id is not None else None
+    try:
+        transactions_list, next_cursor = await db.call(
+            load_transactions_page, month, category_id, after=after, page_size=page_size
+        )
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "message": str(e)})
+
+    return JSONResponse(content={
+        "transactions": transactions_list,
+        "next_cursor": {"fecha": next_cursor[0], "id": next_cursor[1]} if next_cursor else None
+    })
+
+@app.get("/api/summary")
+async def get_summary(
+    month: Optional[str] = None,
+    category_id: Optional[int] = None,
+    db: AsyncDatabaseConnection = Depends(get_db)
+):
+    try:
+        summary = await db.call(load_summary, month, category_id)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "message": str(e)})
+
+    return JSONResponse(content=summary)
+
+# Versioned, column-oriented endpoints used by the dashboard: one list per field,
+# and ?fields=id,fecha,importe to send only some of them
+@app.get("/api/v1/transactions")
+async def list_transactions_v1(
+    month: Optional[str] = None,
+    category_id: Optional[int] = None,
+    after_fecha: Optional[str] = None,
+    after_id: Optional[int] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    fields: Optional[str] = None,
+    db: AsyncDatabaseConnection = Depends(get_db)
+):
+    after = (after_fecha, after_id) if after_fecha is not None and after_id is not None else None
+    try:
+        selected = select_fields(fields, TRANSACTION_FIELDS)
+        page = await db.call(load_transactions_columns, month, category_id, after, page_size, selected)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "message": str(e)})
+    return JSONResponse(content=page)
+
+@app.get("/api/v1/summary")
+async def get_summary_v1(
+    month: Optional[str] = None,
+    category_id: Optional[int] = None,
+    fields: Optional[str] = None,
+    db: AsyncDatabaseConnection = Depends(get_db)
+):
+    try:
+        selected = select_fields(fields, SUMMARY_FIELDS)
+        summary = await db.call(load_summary_columns, month, category_id, selected)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "message": str(e)})
+    return JSONResponse(content=summary)
+
+@app.get("/api/reports/categories")
+async def get_category_report_range(
+    start_month: Optional[str] = None,
+    end_month: Optional[str] = None,
+    granularity: str = 'month',
+    category_id: Optional[int] = None,
+    db: AsyncDatabaseConnection = Depends(get_db)
+):
+    try:
+        report = await db.call(fetch_category_report_range, start_month, end_month, granularity, category_id)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "message": str(e)})
+
+    return JSONResponse(content=report)
+
+@app.get("/api/rules")
+async def get_rules(db: AsyncDatabaseConnection = Depends(get_db)):
+    return JSONResponse(content=await db.call(list_rules))
+
+@app.post("/api/rules")
+async def add_rule(rule: CategorizationRule, db: AsyncDatabaseConnection = Depends(get_db)):
+    try:
+        rule_id = await db.call(create_rule, **rule.dict())
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "message": str(e)})
+
+    if rule_id is None:
+        return JSONResponse(status_code=500, content={"success": False, "message": "Internal server error"})
+    return JSONResponse(content={"success": True, "message": "Rule created successfully", "id": rule_id})
+
+@app.delete("/api/rules/{rule_id}")
+async def remove_rule(rule_id: int, db: AsyncDatabaseConnection = Depends(get_db)):
+    if await db.call(delete_rule, rule_id) > 0:
+        return JSONResponse(content={"success": True, "message": "Rule deleted successfully"})
+    return JSONResponse(status_code=404, content={"success": False, "message": "Rule not found"})
+
+@app.post("/api/rules/apply")
+async def run_rules(dry_run: bool = False, db: AsyncDatabaseConnection = Depends(get_db)):
+    # Categorizes every movement that has no category yet
+    return JSONResponse(content=await db.call(apply_rules, dry_run=dry_run))
+
+@app.post("/api/suggestions")
+async def get_category_suggestions(request: SuggestionRequest, db: AsyncDatabaseConnection = Depends(get_db)):
+    # Without transaction_ids, suggests categories for every uncategorized transaction
+    suggestions = await db.call(suggest_categories, request.transaction_ids, request.top_n)
+    return JSONResponse(content=suggestions)
+
 @app.get("/categories", response_class=HTMLResponse)
-async def list_categories(request: Request, db: DatabaseConnection = Depends(get_db)):
-    categories = db.select('categories')
+async def list_categories(request: Request, db: AsyncDatabaseConnection = Depends(get_db)):
+    categories = await db.select('categories')
     categories_list = [{'id': c[0], 'name': c[1], 'description': c[2]} for c in categories]
     
     return templates.TemplateResponse(
@@ -304,9 +419,9 @@ async def list_categories(request: Request, db: DatabaseConnection = Depends(get
 async def create_category(
     name: str = Form(...),
     description: str = Form(None),
-    db: DatabaseConnection = Depends(get_db)
+    db: AsyncDatabaseConnection = Depends(get_db)
 ):
-    db.insert('categories', {'name': name, 'description': description})
+    await db.insert('categories', {'name': name, 'description': description})
     return RedirectResponse(url="/categories", status_code=303)
 
 @app.post("/categories/{category_id}/edit")
@@ -314,10 +429,10 @@ async def edit_category(
     category_id: int,
     name: str = Form(...),
     description: str = Form(None),
-    db: DatabaseConnection = Depends(get_db)
+    db: AsyncDatabaseConnection = Depends(get_db)
 ):
     # Update the category
-    db.update(
+    await db.update(
         'categories', 
         {'name': name, 'description': description}, 
         'id = ?', 
@@ -328,65 +443,28 @@ async def edit_category(
 @app.post("/categories/{category_id}/delete")
 async def delete_category(
     category_id: int,
-    db: DatabaseConnection = Depends(get_db)
+    db: AsyncDatabaseConnection = Depends(get_db)
 ):
     # First delete from movements_categories
-    db.delete('movements_categories', 'category_id = ?', (category_id,))
+    await db.delete('movements_categories', 'category_id = ?', (category_id,))
     # Then delete the category
-    db.delete('categories', 'id = ?', (category_id,))
+    await db.delete('categories', 'id = ?', (category_id,))
     return RedirectResponse(url="/categories", status_code=303)
 
 @app.post("/api/transactions/{transaction_id}/add-category")
 async def categorize_transaction_ajax(
     transaction_id: int,
     category_id: int = Form(...),
-    db: DatabaseConnection = Depends(get_db)
+    db: AsyncDatabaseConnection = Depends(get_db)
 ):
     try:
-        # Check if this categorization already exists
-        existing = db.select(
-            'movements_categories', 
-            where='movement_id = ? AND category_id = ?', 
-            where_params=(transaction_id, category_id)
-        )
-        
-        if existing:
-            return JSONResponse(
-                status_code=400,
-                content={"success": False, "message": "Category already assigned to this transaction"}
-            )
-        
-        # Insert the new categorization
-        db.insert('movements_categories', {
-            'movement_id': transaction_id,
-            'category_id': category_id
-        })
-        
-        # Get the category details to return
-        category = db.select(
-            'categories',
-            where='id = ?',
-            where_params=(category_id,)
+        # The unique (movement_id, category_id) index skips existing assignments
+        result = await db.call(assign_category, [transaction_id], category_id)
+    except ValueError:
+        return JSONResponse(
+            status_code=404,
+            content={"success": False, "message": "Category not found"}
         )
-        
-        if category:
-            category_data = {
-                'id': category[0][0],
-                'name': category[0][1],
-                'description': category[0][2]
-            }
-            
-            return JSONResponse(content={
-                "success": True,
-                "message": "Category added successfully",
-                "category": category_data
-            })
-        else:
-            return JSONResponse(
-                status_code=404,
-                content={"success": False, "message": "Category not found"}
-            )
-            
     except Exception as e:
         print(f"Error categorizing transaction: {e}")
         return JSONResponse(
@@ -394,15 +472,69 @@ async def categorize_transaction_ajax(
             content={"success": False, "message": "Internal server error"}
         )
 
+    if result['missing']:
+        return JSONResponse(
+            status_code=404,
+            content={"success": False, "message": "Transaction not found"}
+        )
+    if result['assigned'] == 0:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": "Category already assigned to this transaction"}
+        )
+
+    return JSONResponse(content={
+        "success": True,
+        "message": "Category added successfully",
+        "category": result['category']
+    })
+
+async def _bulk_movement_ids(request: BulkCategoryRequest, db: AsyncDatabaseConnection):
+    if request.transaction_ids is not None:
+        return request.transaction_ids
+    return await db.call(filtered_movement_ids, request.month, request.filter_category_id)
+
+@app.post("/api/transactions/bulk-add-category")
+async def bulk_categorize_transactions(request: BulkCategoryRequest, db: AsyncDatabaseConnection = Depends(get_db)):
+    try:
+        movement_ids = await _bulk_movement_ids(request, db)
+        result = await db.call(assign_category, movement_ids, request.category_id)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "message": str(e)})
+
+    return JSONResponse(content={
+        "success": True,
+        "message": f"Category added to {result['assigned']} transactions",
+        "category": result['category'],
+        "transaction_ids": movement_ids,
+        "affected": result['assigned'],
+        "missing": result['missing']
+    })
+
+@app.post("/api/transactions/bulk-remove-category")
+async def bulk_uncategorize_transactions(request: BulkCategoryRequest, db: AsyncDatabaseConnection = Depends(get_db)):
+    try:
+        movement_ids = await _bulk_movement_ids(request, db)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "message": str(e)})
+
+    removed = await db.call(unassign_category, movement_ids, request.category_id)
+    return JSONResponse(content={
+        "success": True,
+        "message": f"Category removed from {removed} transactions",
+        "transaction_ids": movement_ids,
+        "affected": removed
+    })
+
 @app.delete("/api/transactions/{transaction_id}/remove-category/{category_id}")
 async def remove_category_from_transaction_ajax(
     transaction_id: int,
     category_id: int,
-    db: DatabaseConnection = Depends(get_db)
+    db: AsyncDatabaseConnection = Depends(get_db)
 ):
     try:
         # Remove the categorization
-        rows_affected = db.delete(
+        rows_affected = await db.delete(
             'movements_categories', 
             'movement_id = ? AND category_id = ?', 
             (transaction_id, category_id)
@@ -427,147 +559,138 @@ async def remove_category_from_transaction_ajax(
         )
 
 @app.get("/upload", response_class=HTMLResponse)
-async def upload_page(request: Request):
+async def upload_page(request: Request, job_id: Optional[str] = None):
     return templates.TemplateResponse(
         "upload.html", 
-        {"request": request}
+        {"request": request, "max_upload_mb": MAX_UPLOAD_SIZE // (1024 * 1024), "job_id": job_id}
     )
 
+async def _spool_upload(file: UploadFile, extensions=('.xls', '.xlsx'), spool_dir=None):
+    """Copy an upload to a temporary file in chunks, so it never has to fit in memory."""
+    # Validate file type
+    if not file.filename.lower().endswith(extensions):
+        raise HTTPException(status_code=400, detail=f"Only {', '.join(extensions)} files are allowed")
+
+    spool = tempfile.NamedTemporaryFile(suffix=os.path.splitext(file.filename)[1], dir=spool_dir, delete=False)
+    try:
+        size = 0
+        with spool:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_UPLOAD_SIZE:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"File size too large. Maximum allowed size is {MAX_UPLOAD_SIZE // (1024 * 1024)}MB"
+                    )
+                spool.write(chunk)
+
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty file uploaded")
+    except Exception:
+        os.remove(spool.name)
+        raise
+    return spool.name
+
 @app.post("/upload")
 async def upload_excel(
+    request: Request,
     file: UploadFile = File(...),
-    db: DatabaseConnection = Depends(get_db)
+    db: AsyncDatabaseConnection = Depends(get_db)
 ):
-    # Validate file type
-    if not file.filename.endswith(('.xls', '.xlsx')):
-        raise HTTPException(status_code=400, detail="Only Excel files (.xls, .xlsx) are allowed")
-    
-    # Validate file size (10MB limit)
-    MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
-    
+    wants_json = "application/json" in request.headers.get("accept", "")
     try:
-        # Read file content
-        content = await file.read()
-        
-        if len(content) > MAX_FILE_SIZE:
-            raise HTTPException(status_code=400, detail="File size too large. Maximum allowed size is 10MB")
-        
-        if len(content) == 0:
-            raise HTTPException(status_code=400, detail="Empty file uploaded")
-        
-        # Process Excel file
-        df, format_type = process_excel_file(content)
-        
-        # Insert data into database
-        inserted_count = 0
-        duplicate_count = 0
-        error_count = 0
-        
-        for index, row in df.iterrows():
-            try:
-                # Clean and validate data based on format
-                if format_type == 'euskera':
-                    fecha = str(row['data']).replace('/', '-') if pd.notna(row['data']) else None
-                    fecha_valor = str(row['balio-data']).replace('/', '-') if pd.notna(row['balio-data']) else None
-                    descripcion = str(row['azalpena']).strip() if pd.notna(row['azalpena']) else None
-                    importe_col = 'eragiketaren zenbatekoa'
-                    saldo_col = 'saldoa'
-                else:  # spanish format
-                    # Handle Spanish date format (DD/MM/YYYY) and convert to YYYY-MM-DD
-                    fecha_raw = str(row['fecha']) if pd.notna(row['fecha']) else None
-                    fecha_valor_raw = str(row['fecha valor']) if pd.notna(row['fecha valor']) else None
-                    
-                    # Convert DD/MM/YYYY to YYYY-MM-DD
-                    fecha = None
-                    fecha_valor = None
-                    
-                    if fecha_raw and fecha_raw != 'nan':
-                        try:
-                            # Try to parse DD/MM/YYYY format
-                            if '/' in fecha_raw:
-                                parts = fecha_raw.split('/')
-                                if len(parts) == 3:
-                                    day, month, year = parts
-                                    fecha = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-                        except:
-                            fecha = fecha_raw.replace('/', '-')
-                    
-                    if fecha_valor_raw and fecha_valor_raw != 'nan':
-                        try:
-                            # Try to parse DD/MM/YYYY format
-                            if '/' in fecha_valor_raw:
-                                parts = fecha_valor_raw.split('/')
-                                if len(parts) == 3:
-                                    day, month, year = parts
-                                    fecha_valor = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-                        except:
-                            fecha_valor = fecha_valor_raw.replace('/', '-')
-                    
-                    descripcion = str(row['concepto']).strip() if pd.notna(row['concepto']) else None
-                    importe_col = 'importe'
-                    saldo_col = 'saldo'
-                
-                # Convert amounts to float, handling different formats
-                try:
-                    importe = float(str(row[importe_col]).replace(',', '.')) if pd.notna(row[importe_col]) else 0.0
-                    saldo = float(str(row[saldo_col]).replace(',', '.')) if pd.notna(row[saldo_col]) else 0.0
-                except (ValueError, TypeError):
-                    print(f"Error converting amounts in row {index + 1}: importe={row[importe_col]}, saldo={row[saldo_col]}")
-                    error_count += 1
-                    continue
-                
-                # Skip rows with invalid data
-                if not fecha or not descripcion:
-                    print(f"Skipping row {index + 1}: missing required data")
-                    error_count += 1
-                    continue
-                
-                # Check if movement already exists (by fecha, descripcion, and importe)
-                existing = db.select(
-                    'movimientos',
-                    where='fecha = ? AND descripcion = ? AND importe = ? and saldo = ?',
-                    where_params=(fecha, descripcion, importe, saldo)
-                )
-                
-                if not existing:
-                    # Insert new movement
-                    movement_data = {
-                        'fecha': fecha,
-                        'fecha_valor': fecha_valor,
-                        'descripcion': descripcion,
-                        'importe': importe,
-                        'saldo': saldo
-                    }
-                    
-                    db.insert('movimientos', movement_data)
-                    inserted_count += 1
-                else:
-                    print(f"Duplicate found in row {index + 1}: {fecha} | {descripcion} | {importe}")
-                    duplicate_count += 1
-                    
-            except Exception as row_error:
-                print(f"Error processing row {index + 1}: {row_error}")
-                error_count += 1
-                continue
-        
-        # Build success message
-        success_params = f"upload_success=true&inserted={inserted_count}&duplicates={duplicate_count}"
-        if error_count > 0:
-            success_params += f"&errors={error_count}"
-        
-        # Redirect with success message
-        return RedirectResponse(
-            url=f"/?{success_params}", 
-            status_code=303
-        )
-        
-    except ValueError as e:
-        # Handle processing errors
-        error_msg = str(e).replace("Error processing Excel file: ", "")
-        raise HTTPException(status_code=400, detail=f"File processing error: {error_msg}")
+        path = await _spool_upload(file)
+        try:
+            # The file is parsed, inserted and categorized by a background job,
+            # which also removes the spooled file when it is done
+            job_id = await db.call(submit_import_job, path, file.filename)
+        except Exception:
+            os.remove(path)
+            raise
+    except HTTPException as e:
+        if wants_json:
+            return JSONResponse(status_code=e.status_code, content={"success": False, "message": e.detail})
+        raise
     except Exception as e:
         print(f"Unexpected error uploading file: {e}")
-        raise HTTPException(status_code=500, detail="An unexpected error occurred while processing the file")
+        message = "An unexpected error occurred while processing the file"
+        if wants_json:
+            return JSONResponse(status_code=500, content={"success": False, "message": message})
+        raise HTTPException(status_code=500, detail=message)
+
+    if wants_json:
+        return JSONResponse(status_code=202, content={"success": True, "job_id": job_id})
+    # Plain form posts follow the job on the upload page
+    return RedirectResponse(url=f"/upload?job_id={job_id}", status_code=303)
+
+@app.post("/upload/batch")
+async def upload_excel_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    db: AsyncDatabaseConnection = Depends(get_db)
+):
+    # Many statements, or ZIP archives of them, imported as a single job
+    wants_json = "application/json" in request.headers.get("accept", "")
+    spool_dir = tempfile.mkdtemp(prefix="batch_import_")
+    try:
+        uploads = [
+            (file.filename, await _spool_upload(file, ('.xls', '.xlsx', '.zip'), spool_dir))
+            for file in files
+        ]
+        name = uploads[0][0] if len(uploads) == 1 else f"{len(uploads)} files"
+        job_id = await db.call(create_job, name)
+    except Exception as e:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+        if not isinstance(e, HTTPException):
+            print(f"Unexpected error uploading files: {e}")
+            e = HTTPException(status_code=500, detail="An unexpected error occurred while processing the files")
+        if wants_json:
+            return JSONResponse(status_code=e.status_code, content={"success": False, "message": e.detail})
+        raise e
+
+    task = asyncio.create_task(run_batch_import_job(job_id, uploads, spool_dir))
+    batch_import_tasks.add(task)
+    task.add_done_callback(batch_import_tasks.discard)
+
+    if wants_json:
+        return JSONResponse(status_code=202, content={"success": True, "job_id": job_id})
+    return RedirectResponse(url=f"/upload?job_id={job_id}", status_code=303)
+
+@app.get("/api/import-jobs")
+async def get_import_jobs(limit: int = 20, db: AsyncDatabaseConnection = Depends(get_db)):
+    return JSONResponse(content=await db.call(list_jobs, limit))
+
+@app.get("/api/import-jobs/{job_id}")
+async def get_import_job(job_id: str, db: AsyncDatabaseConnection = Depends(get_db)):
+    job = await db.call(get_job, job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"success": False, "message": "Import job not found"})
+    return JSONResponse(content=job)
+
+@app.get("/api/import-jobs/{job_id}/events")
+async def stream_import_job(job_id: str, request: Request):
+    # Server-sent events with the job every time it changes, until it finishes.
+    # A connection is checked out for each poll and released before sleeping, so
+    # open streams don't keep pooled connections away from other requests.
+    async def events():
+        last_job = None
+        while not await request.is_disconnected():
+            job = await call_with_connection(get_job, job_id)
+            if job is None:
+                yield f"event: error\ndata: {json.dumps({'message': 'Import job not found'})}\n\n"
+                return
+            if job != last_job:
+                yield f"data: {json.dumps(job)}\n\n"
+                last_job = job
+            if job['status'] in FINISHED_STATUSES:
+                return
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 if __name__ == "__main__":
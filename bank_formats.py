@@ -0,0 +1,95 @@
+# Supported bank statement layouts by name. Each descriptor has the header
+# keywords that identify the layout, the source column of every movimientos
+# column, the date format and the decimal separator used in its amounts.
+BANK_FORMATS = {}
+
+# Header rows of the layouts already seen: (row index, raw header cells) -> format name
+_layout_cache = {}
+MAX_CACHED_LAYOUTS = 32
+
+
+def register_format(name, columns, date_format, decimal=',', header=None):
+    """
+    Add a bank statement layout to the registry.
+
+    Parameters:
+    name (str): Format name, e.g. 'spanish'.
+    columns (dict): Source column for each of fecha, fecha_valor, descripcion, importe and saldo.
+    date_format (str): strftime format of the dates in the file.
+    decimal (str): Decimal separator of amounts written as text ('.' or ',').
+    header (list, optional): Columns a header row must contain (all the source columns by default).
+    """
+    BANK_FORMATS[name] = {
+        'name': name,
+        'header': list(header or columns.values()),
+        'columns': dict(columns),
+        'date_format': date_format,
+        'decimal': decimal,
+    }
+    _layout_cache.clear()
+
+
+register_format(
+    'euskera',
+    {
+        'fecha': 'data',
+        'fecha_valor': 'balio-data',
+        'descripcion': 'azalpena',
+        'importe': 'eragiketaren zenbatekoa',
+        'saldo': 'saldoa',
+    },
+    date_format='%Y/%m/%d',
+)
+
+register_format(
+    'spanish',
+    {
+        'fecha': 'fecha',
+        'fecha_valor': 'fecha valor',
+        'descripcion': 'concepto',
+        'importe': 'importe',
+        'saldo': 'saldo',
+    },
+    date_format='%d/%m/%Y',
+)
+
+
+def _column_names(row):
+    return [str(cell).strip().lower() if cell is not None else None for cell in row]
+
+
+def detect_format(rows):
+    """
+    Find the header row and bank format among the first rows of a sheet.
+
+    Layouts seen before are recognized by comparing their header row as
+    is, so files from the same bank skip the keyword search; otherwise the
+    header is the first row containing every header keyword of a format.
+
+    Parameters:
+    rows (list): The first sheet rows.
+
+    Returns:
+    tuple: (index of the header row, column names in lowercase, format name)
+
+    Raises:
+    ValueError: If no row has the columns of a supported format.
+    """
+    for (index, header), name in _layout_cache.items():
+        if index < len(rows) and tuple(rows[index]) == header:
+            return index, _column_names(header), name
+
+    min_columns = min(len(spec['header']) for spec in BANK_FORMATS.values())
+    for index, row in enumerate(rows):
+        if sum(cell is not None for cell in row) < min_columns:
+            continue
+        columns = _column_names(row)
+        present = set(columns)
+        for name, spec in BANK_FORMATS.items():
+            if present.issuperset(spec['header']):
+                print(f"Found {name} headers in row {index}")
+                if len(_layout_cache) >= MAX_CACHED_LAYOUTS:
+                    _layout_cache.pop(next(iter(_layout_cache)))
+                _layout_cache[(index, tuple(row))] = name
+                return index, columns, name
+    raise ValueError("Could not find header row with expected columns")
@@ -0,0 +1,193 @@
+import argparse
+import multiprocessing
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from categorization_rules import apply_rules
+from database_connection import DatabaseConnection
+from excel_parser import read_statement
+from movement_importer import MOVEMENT_COLUMNS, MOVEMENT_KEY, write_movements
+from normalization import normalize_movements
+
+# Extensions of the statement files taken from a ZIP archive
+STATEMENT_EXTENSIONS = ('.xls', '.xlsx')
+
+# Limits on what a ZIP archive may expand to, so a small compressed upload
+# can't fill the disk: total bytes extracted (MAX_UPLOAD_SIZE_MB times
+# ZIP_EXPANSION_FACTOR) and number of entries in the archive
+MAX_EXTRACTED_SIZE = (int(os.environ.get("MAX_UPLOAD_SIZE_MB", "200"))
+                      * int(os.environ.get("ZIP_EXPANSION_FACTOR", "4")) * 1024 * 1024)
+MAX_ARCHIVE_MEMBERS = int(os.environ.get("MAX_ARCHIVE_MEMBERS", "1000"))
+
+
+def expand_sources(paths, extract_dir):
+    """
+    Replace ZIP archives by the statement files they contain.
+
+    Members are written to extract_dir under generated names, so paths
+    inside the archive can never point outside of it. Extraction stops once
+    the archives add up to more than MAX_EXTRACTED_SIZE bytes, counting the
+    bytes actually written rather than the sizes the archive declares.
+
+    Parameters:
+    paths (list): (name, path) pairs of uploaded or local files.
+    extract_dir (str): Directory for the extracted files.
+
+    Returns:
+    list: (name, path) pairs of statement files; names of archive members are 'archive.zip/member.xls'.
+
+    Raises:
+    ValueError: If an archive is not a valid ZIP file, has more than
+    MAX_ARCHIVE_MEMBERS entries or expands to more than MAX_EXTRACTED_SIZE.
+    """
+    sources = []
+    extracted = 0
+    for name, path in paths:
+        if not name.lower().endswith('.zip'):
+            sources.append((name, path))
+            continue
+        try:
+            with zipfile.ZipFile(path) as archive:
+                members = archive.infolist()
+                if len(members) > MAX_ARCHIVE_MEMBERS:
+                    raise ValueError(f"{name} has more than {MAX_ARCHIVE_MEMBERS} entries")
+                for number, member in enumerate(members):
+                    member_name = os.path.basename(member.filename)
+                    if member.is_dir() or member_name.startswith('.') or '__MACOSX' in member.filename:
+                        continue
+                    if not member_name.lower().endswith(STATEMENT_EXTENSIONS):
+                        continue
+                    target = os.path.join(extract_dir, f"{len(sources)}_{number}{os.path.splitext(member_name)[1]}")
+                    with archive.open(member) as source, open(target, 'wb') as f:
+                        while chunk := source.read(1024 * 1024):
+                            extracted += len(chunk)
+                            if extracted > MAX_EXTRACTED_SIZE:
+                                raise ValueError(
+                                    f"{name} expands to more than {MAX_EXTRACTED_SIZE // (1024 * 1024)}MB"
+                                )
+                            f.write(chunk)
+                    sources.append((f"{name}/{member.filename}", target))
+        except zipfile.BadZipFile:
+            raise ValueError(f"{name} is not a valid ZIP archive")
+    return sources
+
+
+def parse_statement_file(path):
+    """
+    Read and normalize a whole statement file (runs in a worker process).
+
+    Returns:
+    tuple: (DataFrame with MOVEMENT_COLUMNS, number of invalid rows)
+
+    Raises:
+    ValueError: If the file is not a supported bank statement, can't be read
+    (e.g. a corrupt sheet found after the header) or has no data rows.
+    """
+    frames, error_count = [], 0
+    try:
+        format_type, batches = read_statement(path)
+        for batch in batches:
+            movements, errors = normalize_movements(batch, format_type)
+            frames.append(movements)
+            error_count += errors
+    except ValueError:
+        raise
+    except Exception as e:
+        # Reader errors only concern this file, so they are reported like any other unreadable file
+        raise ValueError(f"Could not read the Excel file: {e}") from e
+    if not frames:
+        raise ValueError("No data rows found in the Excel file after processing")
+    return pd.concat(frames, ignore_index=True), error_count
+
+
+def merge_movements(frames):
+    """
+    Merge the movements of many files, dropping the ones repeated across files.
+
+    Returns:
+    tuple: (merged DataFrame, number of repeated movements dropped)
+    """
+    if not frames:
+        return pd.DataFrame(columns=MOVEMENT_COLUMNS), 0
+    merged = pd.concat(frames, ignore_index=True)
+    unique = merged.drop_duplicates(subset=MOVEMENT_KEY).reset_index(drop=True)
+    return unique, len(merged) - len(unique)
+
+
+def write_batch(db, frames):
+    """
+    Merge parsed files and write them in one transaction, then categorize the new movements.
+
+    Parameters:
+    db (DatabaseConnection): An open database connection.
+    frames (list): DataFrames returned by parse_statement_file.
+
+    Returns:
+    dict: 'rows' (valid rows read), 'inserted', 'duplicates' (across files and
+    against the database) and 'categorized' counts.
+    """
+    rows = sum(len(frame) for frame in frames)
+    movements, repeated = merge_movements(frames)
+
+    ids = write_movements(db, movements) if not movements.empty else []
+    inserted = len(ids)
+    categorized = apply_rules(db, movement_ids=ids)['categorized'] if ids else 0
+
+    print(f"Imported {inserted} movements from {len(frames)} files ({rows - inserted} duplicates)")
+    return {'rows': rows, 'inserted': inserted, 'duplicates': repeated + len(movements) - inserted,
+            'categorized': categorized}
+
+
+def import_files(paths, workers=None):
+    """
+    Import many statement files and ZIP archives at once.
+
+    Files are parsed in parallel in worker processes with the same format
+    detection as uploads; the movements of all of them are merged and
+    deduplicated in memory and written in a single transaction.
+
+    Parameters:
+    paths (list): Paths to .xls/.xlsx files or .zip archives.
+    workers (int, optional): Number of worker processes (EXCEL_PARSE_WORKERS by default).
+
+    Returns:
+    dict: The write_batch counts plus 'errors' (invalid rows) and 'failed',
+    a list of (file name, error message) for the files that could not be read.
+    """
+    workers = workers or int(os.environ.get("EXCEL_PARSE_WORKERS", "2"))
+    with tempfile.TemporaryDirectory() as extract_dir:
+        sources = expand_sources([(os.path.basename(path), path) for path in paths], extract_dir)
+
+        frames, failed, error_count = [], [], 0
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = {executor.submit(parse_statement_file, path): name for name, path in sources}
+            for future in as_completed(futures):
+                try:
+                    movements, errors = future.result()
+                except ValueError as e:
+                    failed.append((futures[future], str(e)))
+                    continue
+                frames.append(movements)
+                error_count += errors
+
+    with DatabaseConnection() as db:
+        result = write_batch(db, frames)
+    return {**result, 'errors': error_count, 'failed': sorted(failed)}
+
+
+if __name__ == "__main__":
+    # Import statements from the command line: python batch_import.py 2024/*.xls cuentas.zip
+    parser = argparse.ArgumentParser(description="Import bank statement files (.xls, .xlsx or .zip archives)")
+    parser.add_argument('paths', nargs='+', help="Statement files or ZIP archives")
+    parser.add_argument('--workers', type=int, default=None, help="Parallel parsing processes")
+    args = parser.parse_args()
+
+    result = import_files(args.paths, args.workers)
+    print(f"{result['inserted']} new movements, {result['duplicates']} duplicates, "
+          f"{result['errors']} invalid rows, {result['categorized']} categorized by rules")
+    for name, error in result['failed']:
+        print(f"Could not import {name}: {error}")
@@ -0,0 +1,103 @@
+import json
+
+from transaction_queries import movement_filters
+
+
+def filtered_movement_ids(db, month=None, category_id=None):
+    """
+    IDs of the movements matching the transaction list filters.
+
+    Parameters:
+    db (DatabaseConnection): An open database connection.
+    month (str, optional): Month in 'YYYY-MM' format.
+    category_id (int, optional): Only movements with this category.
+
+    Returns:
+    list: Movement ids.
+
+    Raises:
+    ValueError: If the month is not valid.
+    """
+    where_clauses, where_params = movement_filters(month, category_id)
+    query = "SELECT m.id FROM movimientos m"
+    if where_clauses:
+        query += " WHERE " + " AND ".join(where_clauses)
+    return [row[0] for row in db.execute_query(query, where_params)]
+
+
+def _existing_movement_ids(db, movement_ids):
+    """Keep the ids that exist in movimientos (passed as one JSON parameter, so any number of ids fits)."""
+    rows = db.execute_query(
+        "SELECT id FROM movimientos WHERE id IN (SELECT value FROM json_each(?)) ORDER BY id",
+        (json.dumps([int(movement_id) for movement_id in movement_ids]),)
+    )
+    return [row[0] for row in rows]
+
+
+def _check_category(db, category_id):
+    """
+    Return the category as a dict.
+
+    Raises:
+    ValueError: If the category doesn't exist.
+    """
+    category = db.select('categories', where='id = ?', where_params=(category_id,))
+    if not category:
+        raise ValueError(f"Category {category_id} not found")
+    return {'id': category[0][0], 'name': category[0][1], 'description': category[0][2]}
+
+
+def assign_category(db, movement_ids, category_id):
+    """
+    Assign a category to many movements in one transaction.
+
+    Movements that already have the category are skipped by the unique
+    (movement_id, category_id) index.
+
+    Parameters:
+    db (DatabaseConnection): An open database connection.
+    movement_ids (list): IDs of the movements.
+    category_id (int): The category to assign.
+
+    Returns:
+    dict: The 'category', the number of movements it was 'assigned' to and
+    the 'missing' ids that don't match any movement.
+
+    Raises:
+    ValueError: If the category doesn't exist.
+    sqlite3.Error: If the assignments can't be written.
+    """
+    category = _check_category(db, category_id)
+    existing = _existing_movement_ids(db, movement_ids) if movement_ids else []
+    found = set(existing)
+    missing = sorted({int(movement_id) for movement_id in movement_ids or []} - found)
+    assigned = 0
+    if existing:
+        assigned = len(db.insert_many_ids(
+            'movements_categories',
+            ['movement_id', 'category_id'],
+            [(movement_id, category_id) for movement_id in existing],
+            ignore_conflicts=True
+        ))
+    return {'category': category, 'assigned': assigned, 'missing': missing}
+
+
+def unassign_category(db, movement_ids, category_id):
+    """
+    Remove a category from many movements in one transaction.
+
+    Parameters:
+    db (DatabaseConnection): An open database connection.
+    movement_ids (list): IDs of the movements.
+    category_id (int): The category to remove.
+
+    Returns:
+    int: Number of movements the category was removed from.
+    """
+    if not movement_ids:
+        return 0
+    return db.delete_many(
+        'movements_categories',
+        ['movement_id', 'category_id'],
+        [(int(movement_id), category_id) for movement_id in movement_ids]
+    )
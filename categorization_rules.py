@@ -0,0 +1,283 @@
+import json
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+# Columns of the categorization_rules table, in the order they are loaded
+RULE_COLUMNS = [
+    'id', 'category_id', 'pattern', 'is_regex', 'min_amount', 'max_amount',
+    'sign', 'start_date', 'end_date', 'priority'
+]
+
+RULE_SIGNS = ('expense', 'income')
+
+
+def rule_regex(pattern, is_regex):
+    """
+    Compile the description pattern of a rule (case-insensitive).
+
+    Plain patterns match as substrings; regex patterns are searched anywhere
+    in the description.
+
+    Raises:
+    ValueError: If the regex doesn't compile.
+    """
+    try:
+        return re.compile(pattern if is_regex else re.escape(pattern), re.IGNORECASE)
+    except re.error as e:
+        raise ValueError(f"Invalid regex '{pattern}': {e}")
+
+
+def _contains(texts, regex):
+    """Mask of the texts where regex is found (without the pandas warning about match groups)."""
+    if regex.groups:
+        return texts.map(lambda text: regex.search(text) is not None).astype(bool)
+    return texts.str.contains(regex)
+
+
+class RuleMatcher:
+    """
+    All categorization rules compiled into a single matcher.
+
+    Descriptions are first filtered with one combined regex of the rule
+    patterns (plus the patterns with groups, checked one by one), so the
+    per-rule checks only run on rows that match some rule.
+    Each rule then checks its pattern, amount range, sign and date window
+    column-wise over the rows still unassigned; rules are tried by priority
+    (then id) and the first one that matches a row wins.
+    """
+
+    def __init__(self, rules):
+        """
+        Parameters:
+        rules (tuple): Rule dicts with the RULE_COLUMNS keys, in matching order.
+        """
+        self.rules = list(rules)
+        self.regexes = [rule_regex(rule['pattern'], rule['is_regex']) for rule in self.rules]
+        # Groups are renumbered in the combined regex, which breaks backreferences and
+        # conditionals, so patterns with groups are checked on their own instead
+        self.separate = [regex for regex in self.regexes if regex.groups]
+        combinable = [regex for regex in self.regexes if not regex.groups]
+        try:
+            self.combined = None
+            if combinable:
+                self.combined = re.compile('|'.join(f"(?:{regex.pattern})" for regex in combinable), re.IGNORECASE)
+        except re.error:
+            # Patterns with inline flags can't be combined; every row is then checked rule by rule
+            self.combined = None
+            self.separate = None
+
+    def match(self, movements):
+        """
+        Find the first matching rule of each movement.
+
+        Parameters:
+        movements (pd.DataFrame): Columns 'fecha', 'descripcion' and 'importe'.
+
+        Returns:
+        pd.Series: Index into self.rules for each movement, -1 where no rule matches.
+        """
+        assigned = pd.Series(-1, index=movements.index)
+        if not self.rules or movements.empty:
+            return assigned
+
+        descriptions = movements['descripcion'].fillna('').astype(str)
+        amounts = movements['importe'].astype(float)
+        fechas = movements['fecha'].fillna('').astype(str)
+
+        if self.separate is not None:
+            remaining = pd.Series(False, index=movements.index)
+            if self.combined is not None:
+                remaining |= descriptions.str.contains(self.combined)
+            for regex in self.separate:
+                remaining |= _contains(descriptions, regex)
+        else:
+            remaining = pd.Series(True, index=movements.index)
+
+        for number, (rule, regex) in enumerate(zip(self.rules, self.regexes)):
+            mask = remaining.copy()
+            if rule['sign'] == 'expense':
+                mask &= amounts < 0
+            elif rule['sign'] == 'income':
+                mask &= amounts > 0
+            if rule['min_amount'] is not None:
+                mask &= amounts.abs() >= rule['min_amount']
+            if rule['max_amount'] is not None:
+                mask &= amounts.abs() <= rule['max_amount']
+            if rule['start_date']:
+                mask &= fechas >= rule['start_date']
+            if rule['end_date']:
+                mask &= fechas <= rule['end_date']
+            if not mask.any():
+                continue
+            mask[mask] = _contains(descriptions[mask], regex)
+            assigned[mask] = number
+            remaining &= ~mask
+            if not remaining.any():
+                break
+
+        return assigned
+
+
+@lru_cache(maxsize=8)
+def _compile(rules):
+    return RuleMatcher(dict(zip(RULE_COLUMNS, rule)) for rule in rules)
+
+
+def load_rules(db):
+    """Load every rule, in matching order (priority, then id)."""
+    rows = db.execute_query(
+        f"SELECT {', '.join(RULE_COLUMNS)} FROM categorization_rules ORDER BY priority, id"
+    )
+    return [tuple(row) for row in rows]
+
+
+def get_rule_matcher(db):
+    """
+    Return the matcher for the current rules.
+
+    Matchers are cached by the rule contents, so the regexes are only
+    recompiled after a rule changes.
+    """
+    return _compile(tuple(load_rules(db)))
+
+
+def list_rules(db):
+    """
+    List the rules with their category names, in matching order.
+
+    Returns:
+    list: Rule dicts with the RULE_COLUMNS keys plus 'category_name'.
+    """
+    rows = db.execute_query(
+        f"""
+        SELECT {', '.join('r.' + column for column in RULE_COLUMNS)}, c.name
+        FROM categorization_rules r
+        JOIN categories c ON c.id = r.category_id
+        ORDER BY r.priority, r.id
+        """
+    )
+    return [{**dict(zip(RULE_COLUMNS, row[:-1])), 'is_regex': bool(row[3]), 'category_name': row[-1]} for row in rows]
+
+
+def create_rule(db, category_id, pattern, is_regex=False, min_amount=None, max_amount=None,
+                sign=None, start_date=None, end_date=None, priority=0):
+    """
+    Add a categorization rule.
+
+    Parameters:
+    db (DatabaseConnection): An open database connection.
+    category_id (int): Category assigned to the matching movements.
+    pattern (str): Substring (or regex if is_regex) searched in the description, case-insensitive.
+    is_regex (bool): Treat pattern as a regular expression.
+    min_amount (float, optional): Minimum absolute amount.
+    max_amount (float, optional): Maximum absolute amount.
+    sign (str, optional): 'expense' or 'income'.
+    start_date (str, optional): First date the rule applies to ('YYYY-MM-DD').
+    end_date (str, optional): Last date the rule applies to ('YYYY-MM-DD').
+    priority (int): Rules with a lower priority are tried first.
+
+    Returns:
+    int: The ID of the new rule, or None if it couldn't be inserted.
+
+    Raises:
+    ValueError: If the pattern, sign, amount range or dates are invalid, or the category doesn't exist.
+    """
+    if not pattern:
+        raise ValueError("The rule pattern can't be empty")
+    rule_regex(pattern, is_regex)
+    if sign is not None and sign not in RULE_SIGNS:
+        raise ValueError(f"Unknown sign '{sign}', expected one of: {', '.join(RULE_SIGNS)}")
+    if min_amount is not None and max_amount is not None and min_amount > max_amount:
+        raise ValueError("min_amount can't be greater than max_amount")
+    for value in (start_date, end_date):
+        if value is not None:
+            try:
+                pd.to_datetime(value, format='%Y-%m-%d')
+            except ValueError:
+                raise ValueError(f"Invalid date '{value}', expected YYYY-MM-DD")
+    if not db.select('categories', where='id = ?', where_params=(category_id,)):
+        raise ValueError(f"Category {category_id} not found")
+
+    return db.insert('categorization_rules', {
+        'category_id': category_id,
+        'pattern': pattern,
+        'is_regex': int(bool(is_regex)),
+        'min_amount': min_amount,
+        'max_amount': max_amount,
+        'sign': sign,
+        'start_date': start_date,
+        'end_date': end_date,
+        'priority': priority,
+    })
+
+
+def delete_rule(db, rule_id):
+    """Delete a rule. Returns the number of deleted rows."""
+    return db.delete('categorization_rules', 'id = ?', (rule_id,))
+
+
+def apply_rules(db, movement_ids=None, dry_run=False):
+    """
+    Categorize the uncategorized movements with the rules.
+
+    Movements that already have a category are never touched. Each
+    matching movement gets the category of its first matching rule, and
+    all assignments are written in one executemany transaction.
+
+    Parameters:
+    db (DatabaseConnection): An open database connection.
+    movement_ids (list, optional): Only consider these movements (e.g. the ones an import just inserted).
+    dry_run (bool): Count the matches without assigning any category.
+
+    Returns:
+    dict: 'checked' movements, 'categorized' movements and 'rules', a list of
+    {'id', 'category_id', 'pattern', 'matches'} dicts in matching order.
+    """
+    matcher = get_rule_matcher(db)
+    report = {'checked': 0, 'categorized': 0, 'rules': []}
+    if not matcher.rules:
+        return report
+
+    query = """
+        SELECT m.id, m.fecha, m.descripcion, m.importe
+        FROM movimientos m
+        WHERE NOT EXISTS (SELECT 1 FROM movements_categories mc WHERE mc.movement_id = m.id)
+    """
+    params = []
+    if movement_ids is not None:
+        query += " AND m.id IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps([int(movement_id) for movement_id in movement_ids]))
+    movements = pd.DataFrame(
+        [tuple(row) for row in db.execute_query(query, params)],
+        columns=['id', 'fecha', 'descripcion', 'importe']
+    )
+
+    assigned = matcher.match(movements)
+    counts = assigned[assigned >= 0].value_counts()
+    report['checked'] = len(movements)
+    report['rules'] = [
+        {
+            'id': rule['id'],
+            'category_id': rule['category_id'],
+            'pattern': rule['pattern'],
+            'matches': int(counts.get(number, 0)),
+        }
+        for number, rule in enumerate(matcher.rules)
+    ]
+
+    matched = assigned >= 0
+    rows = [
+        (int(movement_id), matcher.rules[number]['category_id'])
+        for movement_id, number in zip(movements['id'][matched], assigned[matched])
+    ]
+    if dry_run:
+        report['categorized'] = len(rows)
+    elif rows:
+        # Assignments made meanwhile by another import or a manual bulk-add are skipped, not counted
+        report['categorized'] = db.insert_many(
+            'movements_categories', ['movement_id', 'category_id'], rows, ignore_conflicts=True
+        )
+        print(f"Categorized {report['categorized']} movements with rules")
+    return report
@@ -0,0 +1,335 @@
+import json
+import math
+import os
+import tempfile
+import threading
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from database_connection import DatabaseConnection
+from similarity import normalize_description
+
+# Size of the hashed feature space (character n-grams are hashed into it)
+N_FEATURES = 2 ** 16
+
+# Character n-gram sizes extracted from each description
+NGRAM_SIZES = (3, 4)
+
+# Laplace smoothing of the naive Bayes feature counts
+ALPHA = 0.1
+
+
+def model_path(db):
+    """Where the model of a database is stored (CATEGORY_MODEL_PATH, or next to the database file)."""
+    path = os.environ.get("CATEGORY_MODEL_PATH")
+    if path:
+        return Path(path).expanduser()
+    return db.db_path.with_name(db.db_path.stem + ".category_model.npz")
+
+
+def movement_features(description, amount):
+    """
+    Hashed feature indices of a movement.
+
+    Features are the character n-grams of the normalized description plus
+    the sign and order of magnitude of the amount, hashed with crc32 so
+    the vocabulary never has to be stored.
+    """
+    text = f" {normalize_description(description)} "
+    tokens = [text[i:i + n] for n in NGRAM_SIZES for i in range(max(1, len(text) - n + 1))]
+    amount = float(amount or 0)
+    tokens.append(f"__sign:{'-' if amount < 0 else '+'}")
+    tokens.append(f"__magnitude:{int(math.log10(abs(amount))) if amount else 'zero'}")
+    return [zlib.crc32(token.encode('utf-8')) % N_FEATURES for token in tokens]
+
+
+def feature_matrix(movements):
+    """
+    Sparse features of many movements as coordinate arrays.
+
+    Parameters:
+    movements (list): (description, amount) tuples.
+
+    Returns:
+    tuple: (row index, feature index) arrays, one entry per feature occurrence.
+    """
+    rows, features = [], []
+    for row, (description, amount) in enumerate(movements):
+        indices = movement_features(description, amount)
+        rows.extend([row] * len(indices))
+        features.extend(indices)
+    return np.array(rows, dtype=np.int64), np.array(features, dtype=np.int64)
+
+
+class CategoryModel:
+    """
+    Multinomial naive Bayes over hashed character n-grams.
+
+    The model only keeps per-category counts (how many assignments each
+    category has and how often each hashed feature appears in them), so
+    new assignments are added without retraining. It remembers the last
+    movements_categories id it has seen and how many assignments it was
+    trained on, to know what to add and to detect removed assignments.
+    """
+
+    def __init__(self, category_ids=None, class_counts=None, feature_counts=None,
+                 trained_until=0, trained_rows=0):
+        self.category_ids = np.array(category_ids if category_ids is not None else [], dtype=np.int64)
+        self.class_counts = np.array(class_counts if class_counts is not None else [], dtype=np.float64)
+        self.feature_counts = (
+            np.array(feature_counts, dtype=np.float32) if feature_counts is not None
+            else np.zeros((0, N_FEATURES), dtype=np.float32)
+        )
+        self.trained_until = int(trained_until)
+        self.trained_rows = int(trained_rows)
+        self._log_probs = None
+
+    def add(self, examples):
+        """
+        Add labeled movements to the counts.
+
+        Parameters:
+        examples (list): (description, amount, category_id) tuples.
+        """
+        if not examples:
+            return
+        labels = np.array([example[2] for example in examples], dtype=np.int64)
+        new_ids = np.setdiff1d(np.unique(labels), self.category_ids)
+        if len(new_ids):
+            self.category_ids = np.concatenate([self.category_ids, new_ids])
+            self.class_counts = np.concatenate([self.class_counts, np.zeros(len(new_ids))])
+            self.feature_counts = np.vstack([
+                self.feature_counts, np.zeros((len(new_ids), N_FEATURES), dtype=np.float32)
+            ])
+
+        # Categories are kept in insertion order, so map labels to rows explicitly
+        order = np.argsort(self.category_ids)
+        classes = order[np.searchsorted(self.category_ids, labels, sorter=order)]
+        np.add.at(self.class_counts, classes, 1)
+
+        rows, features = feature_matrix([(example[0], example[1]) for example in examples])
+        np.add.at(self.feature_counts, (classes[rows], features), 1)
+        self._log_probs = None
+
+    def copy(self):
+        """An independent copy of the counts, to update while readers keep using this model."""
+        return CategoryModel(
+            self.category_ids.copy(), self.class_counts.copy(), self.feature_counts.copy(),
+            self.trained_until, self.trained_rows
+        )
+
+    def predict(self, movements, top_n=3, exclude_ids=None):
+        """
+        Suggest categories for many movements in one pass.
+
+        Parameters:
+        movements (list): (description, amount) tuples.
+        top_n (int): Number of suggestions per movement.
+        exclude_ids (set, optional): Category ids never suggested (e.g. deleted categories).
+
+        Returns:
+        list: For each movement, a list of (category_id, probability) pairs, most likely first.
+        """
+        if not movements or not set(self.category_ids.tolist()) - set(exclude_ids or ()):
+            return [[] for _ in movements]
+
+        log_probs = self._log_probs
+        if log_probs is None:
+            smoothed = self.feature_counts + ALPHA
+            log_probs = self._log_probs = np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))
+        log_prior = np.log(self.class_counts / self.class_counts.sum())
+
+        rows, features = feature_matrix(movements)
+        scores = np.tile(log_prior, (len(movements), 1))
+        np.add.at(scores, rows, log_probs[:, features].T)
+
+        if exclude_ids:
+            scores[:, np.isin(self.category_ids, list(exclude_ids))] = -np.inf
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+        top_n = min(int(top_n), len(self.category_ids))
+        best = np.argsort(-probabilities, axis=1)[:, :top_n]
+        return [
+            [(int(self.category_ids[c]), float(probabilities[row, c])) for c in best[row] if probabilities[row, c] > 0]
+            for row in range(len(movements))
+        ]
+
+    def save(self, path):
+        """Write the model to disk (atomically, so a reader never sees a partial file)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # A temporary file per save, so processes saving at once never share one
+        with tempfile.NamedTemporaryFile(dir=path.parent, prefix=path.name + ".", suffix=".tmp", delete=False) as f:
+            try:
+                np.savez(
+                    f,
+                    category_ids=self.category_ids,
+                    class_counts=self.class_counts,
+                    feature_counts=self.feature_counts,
+                    trained_until=self.trained_until,
+                    trained_rows=self.trained_rows,
+                )
+            except BaseException:
+                f.close()
+                os.remove(f.name)
+                raise
+        os.replace(f.name, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a model saved with save(), or return None if there is none."""
+        try:
+            with np.load(path) as data:
+                return cls(
+                    data['category_ids'], data['class_counts'], data['feature_counts'],
+                    data['trained_until'], data['trained_rows']
+                )
+        except (OSError, KeyError, ValueError) as e:
+            if Path(path).exists():
+                print(f"Error loading category model {path}: {e}")
+            return None
+
+
+def _fetch_examples(db, after_id=0):
+    """Labeled movements with movements_categories.id > after_id, as (id, description, amount, category_id)."""
+    rows = db.execute_query(
+        """
+        SELECT mc.id, m.descripcion, m.importe, mc.category_id
+        FROM movements_categories mc
+        JOIN movimientos m ON m.id = mc.movement_id
+        WHERE mc.id > ?
+        ORDER BY mc.id
+        """,
+        (after_id,)
+    )
+    return [tuple(row) for row in rows]
+
+
+def train_model(db):
+    """
+    Train a model from scratch on every category assignment and save it.
+
+    Returns:
+    CategoryModel: The trained model.
+    """
+    examples = _fetch_examples(db)
+    model = CategoryModel()
+    model.add([example[1:] for example in examples])
+    model.trained_until = examples[-1][0] if examples else 0
+    model.trained_rows = len(examples)
+    model.save(model_path(db))
+    print(f"Trained category model on {len(examples)} assignments")
+    return model
+
+
+def update_model(db, model=None):
+    """
+    Bring a model up to date with the category assignments and save it if it changed.
+
+    Assignments added since the model was trained are added to a copy of
+    its counts, so the given model is never modified while others may be
+    predicting with it. If assignments it was trained on were removed, it
+    is retrained from scratch instead, since naive Bayes counts can't tell
+    which ones went.
+
+    Parameters:
+    db (DatabaseConnection): An open database connection.
+    model (CategoryModel, optional): The model to update; loaded from disk if not given.
+
+    Returns:
+    CategoryModel: The updated model (the same object if nothing changed).
+    """
+    if model is None:
+        model = CategoryModel.load(model_path(db))
+    if model is None:
+        return train_model(db)
+
+    still_there = db.execute_query(
+        "SELECT COUNT(*) FROM movements_categories WHERE id <= ?", (model.trained_until,)
+    )[0][0]
+    if still_there != model.trained_rows:
+        return train_model(db)
+
+    examples = _fetch_examples(db, model.trained_until)
+    if examples:
+        model = model.copy()
+        model.add([example[1:] for example in examples])
+        model.trained_until = examples[-1][0]
+        model.trained_rows += len(examples)
+        model.save(model_path(db))
+    return model
+
+
+_model_lock = threading.Lock()
+_model_cache = {}
+
+
+def get_category_model(db):
+    """
+    Return the up-to-date model of a database, kept in memory between calls.
+
+    Cached models are never modified: updates replace them with a new
+    object, so callers can predict outside the lock.
+    """
+    with _model_lock:
+        key = str(db.db_path)
+        model = update_model(db, _model_cache.get(key))
+        _model_cache[key] = model
+        return model
+
+
+def suggest_categories(db, movement_ids=None, top_n=3):
+    """
+    Suggest categories for movements with the learned model.
+
+    Parameters:
+    db (DatabaseConnection): An open database connection.
+    movement_ids (list, optional): Movements to suggest for; every uncategorized movement if not given.
+    top_n (int): Number of suggestions per movement.
+
+    Returns:
+    list: One dict per movement ('id', 'fecha', 'descripcion', 'importe' and
+    'suggestions', a list of {'id', 'name', 'probability'} dicts).
+    """
+    model = get_category_model(db)
+
+    query = "SELECT m.id, m.fecha, m.descripcion, m.importe FROM movimientos m"
+    if movement_ids is None:
+        query += " WHERE NOT EXISTS (SELECT 1 FROM movements_categories mc WHERE mc.movement_id = m.id)"
+        params = []
+    else:
+        if not movement_ids:
+            return []
+        # One JSON parameter, so any number of ids fits under SQLite's variable limit
+        query += " WHERE m.id IN (SELECT value FROM json_each(?))"
+        params = [json.dumps([int(movement_id) for movement_id in movement_ids])]
+    movements = db.execute_query(query + " ORDER BY m.fecha DESC, m.id DESC", params)
+
+    names = {row[0]: row[1] for row in db.execute_query("SELECT id, name FROM categories")}
+    deleted = set(int(c) for c in model.category_ids) - set(names)
+    predictions = model.predict([(m[2], m[3]) for m in movements], top_n, exclude_ids=deleted)
+
+    return [
+        {
+            'id': m[0],
+            'fecha': m[1],
+            'descripcion': m[2],
+            'importe': m[3],
+            'suggestions': [
+                {'id': category_id, 'name': names[category_id], 'probability': round(probability, 4)}
+                for category_id, probability in suggestions
+            ]
+        }
+        for m, suggestions in zip(movements, predictions)
+    ]
+
+
+if __name__ == "__main__":
+    # Retrain the model from scratch: python category_model.py
+    with DatabaseConnection() as db:
+        model = train_model(db)
+        print(f"{len(model.category_ids)} categories, saved to {model_path(db)}")
@@ -0,0 +1,103 @@
+# Category names are paths: 'gastos/casa' is the 'casa' child of 'gastos'
+PATH_SEPARATOR = '/'
+
+
+class CategoryTree:
+    """
+    Category names arranged as a tree of their path segments.
+
+    Parent segments that are not categories themselves ('gastos' for
+    'gastos/casa') become nodes too, so every category has a chain of
+    ancestors up to a root. Nodes are numbered; parents, depths and
+    children are kept in lists indexed by node.
+    """
+
+    def __init__(self, names):
+        self.paths = []     # node -> full path
+        self.names = []     # node -> last segment of the path
+        self.parents = []   # node -> parent node, or -1 for roots
+        self.depths = []    # node -> 1 for roots, 2 for their children...
+        self.children = []  # node -> child nodes
+        self.index = {}     # full path -> node
+        for name in sorted(set(names)):
+            self._add(name)
+        # Deepest nodes first, so subtree totals can be added up in one pass
+        self.bottom_up = sorted(range(len(self.paths)), key=lambda node: -self.depths[node])
+
+    def _add(self, path):
+        node = self.index.get(path)
+        if node is not None:
+            return node
+        head, _, name = path.rpartition(PATH_SEPARATOR)
+        parent = self._add(head) if head else -1
+        node = len(self.paths)
+        self.paths.append(path)
+        self.names.append(name)
+        self.parents.append(parent)
+        self.depths.append(self.depths[parent] + 1 if parent >= 0 else 1)
+        self.children.append([])
+        self.index[path] = node
+        if parent >= 0:
+            self.children[parent].append(node)
+        return node
+
+    def aggregate(self, totals):
+        """
+        Add amounts per category up the tree.
+
+        Parameters:
+        totals (dict): Category name -> amount. Names that are not in the tree are ignored.
+
+        Returns:
+        tuple: (subtree total per node, the node's own amount per node)
+        """
+        own = [0.0] * len(self.paths)
+        for name, amount in totals.items():
+            node = self.index.get(name)
+            if node is not None:
+                own[node] += amount
+        subtree = list(own)
+        for node in self.bottom_up:
+            parent = self.parents[node]
+            if parent >= 0:
+                subtree[parent] += subtree[node]
+        return subtree, own
+
+    def columns(self, totals):
+        """
+        Column-oriented tree of the nodes with a non-zero total, for drill-down charts.
+
+        Returns:
+        dict: 'paths', 'names', 'parents' (position of the parent or -1),
+        'children' (positions of the children), 'totals' (whole subtree)
+        and 'own' (amount of the category itself), one entry per node.
+        """
+        subtree, own = self.aggregate(totals)
+        kept = [node for node in range(len(self.paths)) if subtree[node]]
+        position = {node: i for i, node in enumerate(kept)}
+        return {
+            'paths': [self.paths[node] for node in kept],
+            'names': [self.names[node] for node in kept],
+            'parents': [position.get(self.parents[node], -1) for node in kept],
+            'children': [[position[child] for child in self.children[node] if child in position] for node in kept],
+            'totals': [round(subtree[node], 2) for node in kept],
+            'own': [round(own[node], 2) for node in kept],
+        }
+
+    def rollup_by_level(self, totals, level):
+        """
+        Sum amounts at one level of the hierarchy.
+
+        Categories deeper than level are added to their ancestor at that
+        level; shallower ones are kept as they are.
+
+        Returns:
+        dict: Path of at most level segments -> amount.
+        """
+        subtree, own = self.aggregate(totals)
+        rollup = {}
+        for node, path in enumerate(self.paths):
+            amount = subtree[node] if self.depths[node] == level else own[node] if self.depths[node] < level else 0
+            if amount:
+                rollup[path] = amount
+        return rollup
@@ -1,7 +1,392 @@
+import asyncio
+import functools
 import os
+import queue
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# Storage profile, configurable through the environment. The web app and the MCP
+# server run as separate processes on the same file: WAL lets readers proceed
+# while a writer is active, and the busy timeout makes writers queue instead of
+# failing straight away with "database is locked".
+STORAGE_PROFILE = {
+    "journal_mode": os.environ.get("DATABASE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.environ.get("DATABASE_SYNCHRONOUS", "NORMAL"),
+    "cache_size": os.environ.get("DATABASE_CACHE_SIZE", "-20000"),  # negative: size in KiB
+    "mmap_size": os.environ.get("DATABASE_MMAP_SIZE", "268435456"),
+    "temp_store": os.environ.get("DATABASE_TEMP_STORE", "MEMORY"),
+    "busy_timeout": os.environ.get("DATABASE_BUSY_TIMEOUT", "5000"),  # milliseconds
+}
+
+# PRAGMAs applied once to every new connection opened by the pool
+CONNECTION_PRAGMAS = {
+    "foreign_keys": "ON",
+    **STORAGE_PROFILE,
+}
+
+# Extra attempts for a write that still finds the database locked after the busy timeout
+WRITE_RETRIES = int(os.environ.get("DATABASE_WRITE_RETRIES", "3"))
+WRITE_RETRY_DELAY = 0.1  # seconds, doubled after each attempt
+
+# Recomputes monthly_category_totals from scratch (see migration 3 and rollups.py).
+# Movements without a date have no month and are left out, as the triggers do.
+REBUILD_MONTHLY_TOTALS_SQL = """
+    DELETE FROM monthly_category_totals;
+    INSERT INTO monthly_category_totals (month, category_id, spent, received, count)
+        SELECT
+            substr(m.fecha, 1, 7),
+            COALESCE(mc.category_id, 0),
+            SUM(CASE WHEN m.importe < 0 THEN -m.importe ELSE 0 END),
+            SUM(CASE WHEN m.importe > 0 THEN m.importe ELSE 0 END),
+            COUNT(*)
+        FROM movimientos m
+        LEFT JOIN movements_categories mc ON mc.movement_id = m.id
+        WHERE m.fecha IS NOT NULL
+        GROUP BY 1, 2;
+"""
+
+# Schema migrations, applied in order on top of the base tables. The position of
+# each script in the list is the PRAGMA user_version it brings the database to.
+MIGRATIONS = [
+    # 1: unique natural key for movements, so imports can rely on conflict-ignoring inserts.
+    # Movements duplicated before the index existed are merged into the oldest copy.
+    """
+    CREATE TEMP TABLE movement_duplicates AS
+        SELECT m.id AS id, k.keep_id AS keep_id
+        FROM movimientos m
+        JOIN (
+            SELECT MIN(id) AS keep_id, fecha, descripcion, importe, saldo
+            FROM movimientos
+            GROUP BY fecha, descripcion, importe, saldo
+            HAVING COUNT(*) > 1
+        ) k ON m.fecha = k.fecha AND m.descripcion = k.descripcion
+           AND m.importe = k.importe AND m.saldo = k.saldo
+        WHERE m.id <> k.keep_id;
+    UPDATE movements_categories
+        SET movement_id = (SELECT keep_id FROM movement_duplicates WHERE id = movement_id)
+        WHERE movement_id IN (SELECT id FROM movement_duplicates);
+    DELETE FROM movimientos WHERE id IN (SELECT id FROM movement_duplicates);
+    DROP TABLE movement_duplicates;
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_movimientos_natural_key
+        ON movimientos (fecha, descripcion, importe, saldo);
+    """,
+    # 2: indexes for month range filters and category joins
+    """
+    CREATE INDEX IF NOT EXISTS idx_movimientos_fecha ON movimientos (fecha);
+    CREATE INDEX IF NOT EXISTS idx_movements_categories_movement ON movements_categories (movement_id);
+    CREATE INDEX IF NOT EXISTS idx_movements_categories_category ON movements_categories (category_id);
+    """,
+    # 3: monthly per-category rollup, kept up to date by triggers so that writes
+    # from both the web app and the MCP server maintain it
+    """
+    DELETE FROM movements_categories
+        WHERE category_id NOT IN (SELECT id FROM categories)
+           OR movement_id NOT IN (SELECT id FROM movimientos);
+    CREATE TABLE IF NOT EXISTS monthly_category_totals (
+        month TEXT NOT NULL,
+        category_id INTEGER NOT NULL,  -- 0 for movements without a category
+        spent REAL NOT NULL DEFAULT 0,
+        received REAL NOT NULL DEFAULT 0,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (month, category_id)
+    );
+    """ + REBUILD_MONTHLY_TOTALS_SQL + """
+    CREATE TRIGGER IF NOT EXISTS categories_delete_assignments
+    BEFORE DELETE ON categories
+    BEGIN
+        DELETE FROM movements_categories WHERE category_id = OLD.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS movimientos_rollup_insert
+    AFTER INSERT ON movimientos
+    WHEN NEW.fecha IS NOT NULL
+    BEGIN
+        INSERT OR IGNORE INTO monthly_category_totals (month, category_id)
+            VALUES (substr(NEW.fecha, 1, 7), 0);
+        UPDATE monthly_category_totals
+            SET spent = spent + (CASE WHEN NEW.importe < 0 THEN -NEW.importe ELSE 0 END),
+                received = received + (CASE WHEN NEW.importe > 0 THEN NEW.importe ELSE 0 END),
+                count = count + 1
+            WHERE month = substr(NEW.fecha, 1, 7) AND category_id = 0;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS movimientos_rollup_delete
+    AFTER DELETE ON movimientos
+    WHEN OLD.fecha IS NOT NULL
+    BEGIN
+        UPDATE monthly_category_totals
+            SET spent = spent - (CASE WHEN OLD.importe < 0 THEN -OLD.importe ELSE 0 END),
+                received = received - (CASE WHEN OLD.importe > 0 THEN OLD.importe ELSE 0 END),
+                count = count - 1
+            WHERE month = substr(OLD.fecha, 1, 7)
+              AND (category_id IN (SELECT category_id FROM movements_categories WHERE movement_id = OLD.id)
+                   OR (category_id = 0 AND NOT EXISTS (
+                       SELECT 1 FROM movements_categories WHERE movement_id = OLD.id)));
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS movements_categories_rollup_insert
+    AFTER INSERT ON movements_categories
+    WHEN (SELECT fecha FROM movimientos WHERE id = NEW.movement_id) IS NOT NULL
+    BEGIN
+        -- The movement leaves the uncategorized bucket with its first category
+        UPDATE monthly_category_totals
+            SET spent = spent - (SELECT CASE WHEN importe < 0 THEN -importe ELSE 0 END FROM movimientos WHERE id = NEW.movement_id),
+                received = received - (SELECT CASE WHEN importe > 0 THEN importe ELSE 0 END FROM movimientos WHERE id = NEW.movement_id),
+                count = count - 1
+            WHERE category_id = 0
+              AND month = (SELECT substr(fecha, 1, 7) FROM movimientos WHERE id = NEW.movement_id)
+              AND (SELECT COUNT(*) FROM movements_categories WHERE movement_id = NEW.movement_id) = 1;
+        INSERT OR IGNORE INTO monthly_category_totals (month, category_id)
+            SELECT substr(fecha, 1, 7), NEW.category_id FROM movimientos WHERE id = NEW.movement_id;
+        UPDATE monthly_category_totals
+            SET spent = spent + (SELECT CASE WHEN importe < 0 THEN -importe ELSE 0 END FROM movimientos WHERE id = NEW.movement_id),
+                received = received + (SELECT CASE WHEN importe > 0 THEN importe ELSE 0 END FROM movimientos WHERE id = NEW.movement_id),
+                count = count + 1
+            WHERE category_id = NEW.category_id
+              AND month = (SELECT substr(fecha, 1, 7) FROM movimientos WHERE id = NEW.movement_id);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS movements_categories_rollup_delete
+    AFTER DELETE ON movements_categories
+    WHEN (SELECT fecha FROM movimientos WHERE id = OLD.movement_id) IS NOT NULL
+    BEGIN
+        UPDATE monthly_category_totals
+            SET spent = spent - (SELECT CASE WHEN importe < 0 THEN -importe ELSE 0 END FROM movimientos WHERE id = OLD.movement_id),
+                received = received - (SELECT CASE WHEN importe > 0 THEN importe ELSE 0 END FROM movimientos WHERE id = OLD.movement_id),
+                count = count - 1
+            WHERE category_id = OLD.category_id
+              AND month = (SELECT substr(fecha, 1, 7) FROM movimientos WHERE id = OLD.movement_id);
+        -- The movement goes back to the uncategorized bucket when its last category is removed
+        INSERT OR IGNORE INTO monthly_category_totals (month, category_id)
+            SELECT substr(fecha, 1, 7), 0 FROM movimientos
+            WHERE id = OLD.movement_id
+              AND NOT EXISTS (SELECT 1 FROM movements_categories WHERE movement_id = OLD.movement_id);
+        UPDATE monthly_category_totals
+            SET spent = spent + (SELECT CASE WHEN importe < 0 THEN -importe ELSE 0 END FROM movimientos WHERE id = OLD.movement_id),
+                received = received + (SELECT CASE WHEN importe > 0 THEN importe ELSE 0 END FROM movimientos WHERE id = OLD.movement_id),
+                count = count + 1
+            WHERE category_id = 0
+              AND month = (SELECT substr(fecha, 1, 7) FROM movimientos WHERE id = OLD.movement_id)
+              AND NOT EXISTS (SELECT 1 FROM movements_categories WHERE movement_id = OLD.movement_id);
+    END;
+    """,
+    # 4: rules that categorize movements automatically (see categorization_rules.py)
+    """
+    CREATE TABLE IF NOT EXISTS categorization_rules (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        category_id INTEGER NOT NULL,
+        pattern TEXT NOT NULL,
+        is_regex INTEGER NOT NULL DEFAULT 0,
+        min_amount REAL,
+        max_amount REAL,
+        sign TEXT CHECK (sign IN ('expense', 'income')),
+        start_date TEXT,
+        end_date TEXT,
+        priority INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (category_id) REFERENCES categories(id)
+    );
+
+    CREATE TRIGGER IF NOT EXISTS categories_delete_rules
+    BEFORE DELETE ON categories
+    BEGIN
+        DELETE FROM categorization_rules WHERE category_id = OLD.id;
+    END;
+    """,
+    # 5: a category can only be assigned once to a movement, so bulk assignments can
+    # rely on conflict-ignoring inserts. Repeated assignments keep the oldest row.
+    """
+    DELETE FROM movements_categories
+        WHERE id NOT IN (SELECT MIN(id) FROM movements_categories GROUP BY movement_id, category_id);
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_movements_categories_unique
+        ON movements_categories (movement_id, category_id);
+    """,
+    # 6: background import jobs and their progress (see import_jobs.py)
+    """
+    CREATE TABLE IF NOT EXISTS import_jobs (
+        id TEXT PRIMARY KEY,
+        filename TEXT,
+        status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'failed')),
+        rows_processed INTEGER NOT NULL DEFAULT 0,
+        inserted INTEGER NOT NULL DEFAULT 0,
+        duplicates INTEGER NOT NULL DEFAULT 0,
+        errors INTEGER NOT NULL DEFAULT 0,
+        categorized INTEGER NOT NULL DEFAULT 0,
+        message TEXT,
+        created_at TEXT NOT NULL,
+        started_at TEXT,
+        finished_at TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_import_jobs_created ON import_jobs (created_at);
+    """,
+    # 7: generation counter bumped by triggers on every change to the data the read
+    # caches hold, so the web app and the MCP server can tell when their caches are stale
+    """
+    CREATE TABLE IF NOT EXISTS data_generation (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        generation INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO data_generation (id, generation) VALUES (1, 0);
+
+    CREATE TRIGGER IF NOT EXISTS movimientos_generation_insert
+    AFTER INSERT ON movimientos
+    BEGIN
+        UPDATE data_generation SET generation = generation + 1 WHERE id = 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS movimientos_generation_update
+    AFTER UPDATE ON movimientos
+    BEGIN
+        UPDATE data_generation SET generation = generation + 1 WHERE id = 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS movimientos_generation_delete
+    AFTER DELETE ON movimientos
+    BEGIN
+        UPDATE data_generation SET generation = generation + 1 WHERE id = 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS categories_generation_insert
+    AFTER INSERT ON categories
+    BEGIN
+        UPDATE data_generation SET generation = generation + 1 WHERE id = 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS categories_generation_update
+    AFTER UPDATE ON categories
+    BEGIN
+        UPDATE data_generation SET generation = generation + 1 WHERE id = 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS categories_generation_delete
+    AFTER DELETE ON categories
+    BEGIN
+        UPDATE data_generation SET generation = generation + 1 WHERE id = 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS movements_categories_generation_insert
+    AFTER INSERT ON movements_categories
+    BEGIN
+        UPDATE data_generation SET generation = generation + 1 WHERE id = 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS movements_categories_generation_update
+    AFTER UPDATE ON movements_categories
+    BEGIN
+        UPDATE data_generation SET generation = generation + 1 WHERE id = 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS movements_categories_generation_delete
+    AFTER DELETE ON movements_categories
+    BEGIN
+        UPDATE data_generation SET generation = generation + 1 WHERE id = 1;
+    END;
+    """,
+]
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections to a single database file.
+
+    Connections are opened lazily up to max_size, configured once, and
+    reused across DatabaseConnection instances. Idle connections are
+    health-checked when they are checked out again.
+    """
+
+    def __init__(self, db_path, max_size=5, timeout=30):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def _open(self):
+        """Open and configure a new connection."""
+        connection = sqlite3.connect(
+            str(self.db_path),
+            timeout=int(STORAGE_PROFILE["busy_timeout"]) / 1000,
+            check_same_thread=False
+        )
+        for pragma, value in CONNECTION_PRAGMAS.items():
+            connection.execute(f"PRAGMA {pragma} = {value}")
+        # Return dictionaries instead of tuples
+        connection.row_factory = sqlite3.Row
+        print(f"Connected to database: {self.db_path}")
+        return connection
+
+    @staticmethod
+    def _is_healthy(connection):
+        """Check that an idle connection is still usable."""
+        try:
+            connection.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def checkout(self):
+        """
+        Take a connection from the pool, opening a new one if none is idle.
+
+        Raises:
+        sqlite3.OperationalError: If every connection stays in use for longer than the pool timeout.
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError(f"No database connection available after {self.timeout}s")
+        try:
+            while True:
+                try:
+                    connection = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._open()
+                if self._is_healthy(connection):
+                    return connection
+                connection.close()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def checkin(self, connection):
+        """Return a connection to the pool, discarding any uncommitted changes."""
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+            self._idle.put(connection)
+        except sqlite3.Error:
+            connection.close()
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        """Close every idle connection."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path):
+    """
+    Return the connection pool for a database file, creating it on first use.
+
+    Pools are per process: a pool inherited through fork is replaced.
+    """
+    key = str(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.pid != os.getpid():
+            pool = ConnectionPool(db_path, max_size=int(os.environ.get("DATABASE_POOL_SIZE", "5")))
+            _pools[key] = pool
+        return pool
+
+
 class DatabaseConnection:
     def __init__(self):
         db_path = os.environ.get("DATABASE_PATH", "movimientos.db")
@@ -11,6 +396,7 @@ class DatabaseConnection:
             self.db_path = (project_root / self.db_path).resolve()
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self.connection = None
+        self._pool = None
 
     def __enter__(self):
         """Enter the context manager."""
@@ -23,22 +409,20 @@ class DatabaseConnection:
         return False
 
     def connect(self):
-        """Establish a connection to the SQLite database."""
+        """Check out a connection to the SQLite database from the process-wide pool."""
+        if self.connection:
+            return
         try:
-            self.connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
-            # Enable foreign keys
-            self.connection.execute("PRAGMA foreign_keys = ON")
-            # Return dictionaries instead of tuples
-            self.connection.row_factory = sqlite3.Row
-            print(f"Connected to database: {self.db_path}")
+            self._pool = get_pool(self.db_path)
+            self.connection = self._pool.checkout()
         except sqlite3.Error as e:
             print(f"Error connecting to database: {e}")
 
     def close(self):
-        """Close the database connection."""
+        """Return the database connection to the pool."""
         if self.connection:
-            self.connection.close()
-            print("Database connection closed.")
+            self._pool.checkin(self.connection)
+            self.connection = None
 
     def execute_query(self, query, params=None):
         """
@@ -77,6 +461,63 @@ class DatabaseConnection:
         else:
             print("No database connection established.")
 
+    def write_version(self):
+        """
+        Return the data generation of the database file.
+
+        Triggers bump it on every change to movimientos, categories and
+        movements_categories, whichever process makes it, so results cached
+        with it can be checked with a single-row read.
+
+        Returns:
+        int: The generation, or None if it can't be read.
+        """
+        rows = self.execute_query("SELECT generation FROM data_generation WHERE id = 1")
+        return rows[0][0] if rows else None
+
+    def _execute_write(self, query, params, many=False):
+        """
+        Execute a write statement and commit it, retrying while the database is busy.
+
+        Parameters:
+        query (str): The SQL statement to execute.
+        params (tuple or list): Parameters for the statement (a list of tuples if many is True).
+        many (bool): Use executemany instead of execute.
+
+        Returns:
+        sqlite3.Cursor: The cursor used for the successful attempt.
+        """
+        def write(cursor):
+            if many:
+                cursor.executemany(query, params)
+            else:
+                cursor.execute(query, params)
+            return cursor
+
+        return self._run_write(write)
+
+    def _run_write(self, write):
+        """
+        Run write(cursor) in a transaction and commit it, retrying while the database is busy.
+
+        Returns:
+        The value returned by write for the successful attempt.
+        """
+        for attempt in range(WRITE_RETRIES + 1):
+            cursor = self.connection.cursor()
+            try:
+                result = write(cursor)
+                self.connection.commit()
+                return result
+            except sqlite3.OperationalError as e:
+                cursor.close()
+                self.connection.rollback()
+                busy = "locked" in str(e) or "busy" in str(e)
+                if not busy or attempt == WRITE_RETRIES:
+                    raise
+                print(f"Database busy, retrying write ({attempt + 1}/{WRITE_RETRIES})")
+                time.sleep(WRITE_RETRY_DELAY * 2 ** attempt)
+
     def insert(self, table, data):
         """
         Insert data into the specified table.
@@ -97,16 +538,114 @@ class DatabaseConnection:
 
         query = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
 
-        cursor = self.connection.cursor()
         try:
-            cursor.execute(query, values)
-            self.commit()
+            cursor = self._execute_write(query, values)
+            cursor.close()
             return cursor.lastrowid
         except sqlite3.Error as e:
             print(f"Error inserting data: {e}")
             return None
-        finally:
+
+    def insert_many(self, table, columns, rows, ignore_conflicts=False):
+        """
+        Insert many rows into the specified table in a single transaction.
+
+        Parameters:
+        table (str): The name of the table.
+        columns (list): Column names, in the same order as the row values.
+        rows (iterable): Tuples of values to insert.
+        ignore_conflicts (bool): Skip rows violating a unique constraint instead of failing.
+
+        Returns:
+        int: Number of rows inserted (0 if the batch failed and was rolled back).
+        """
+        if not self.connection:
+            self.connect()
+
+        placeholders = ', '.join(['?' for _ in columns])
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+        if ignore_conflicts:
+            query += " ON CONFLICT DO NOTHING"
+
+        try:
+            # Materialized so the batch can be replayed if the write has to be retried
+            cursor = self._execute_write(query, list(rows), many=True)
             cursor.close()
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            self.connection.rollback()
+            print(f"Error inserting data: {e}")
+            return 0
+
+    def insert_many_ids(self, table, columns, rows, ignore_conflicts=False):
+        """
+        Insert many rows in a single transaction and return the ids of the rows inserted.
+
+        The write lock is taken before the current maximum id is read, so
+        every id above it at commit time belongs to this insert, whatever
+        other connections or processes are writing.
+
+        Parameters:
+        table (str): The name of the table (with an integer id primary key).
+        columns (list): Column names, in the same order as the row values.
+        rows (iterable): Tuples of values to insert.
+        ignore_conflicts (bool): Skip rows violating a unique constraint instead of failing.
+
+        Returns:
+        list: Ids of the inserted rows, in ascending order.
+
+        Raises:
+        sqlite3.Error: If the insert fails; nothing is written.
+        """
+        if not self.connection:
+            self.connect()
+
+        placeholders = ', '.join(['?' for _ in columns])
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+        if ignore_conflicts:
+            query += " ON CONFLICT DO NOTHING"
+        rows = list(rows)
+
+        def write(cursor):
+            try:
+                cursor.execute("BEGIN IMMEDIATE")
+                last_id = cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+                cursor.executemany(query, rows)
+                return [row[0] for row in cursor.execute(f"SELECT id FROM {table} WHERE id > ? ORDER BY id", (last_id,))]
+            finally:
+                cursor.close()
+
+        try:
+            return self._run_write(write)
+        except sqlite3.Error:
+            self.connection.rollback()
+            raise
+
+    def migrate(self):
+        """
+        Apply the pending schema migrations.
+
+        Each migration runs in its own transaction together with the
+        PRAGMA user_version bump that records it.
+
+        Raises:
+        sqlite3.Error: If a migration fails. It is rolled back and the later
+        ones are not applied, so the app doesn't run on a half-migrated schema.
+        """
+        if not self.connection:
+            self.connect()
+
+        version = self.execute_query("PRAGMA user_version")[0][0]
+        for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+            try:
+                self.connection.executescript(
+                    f"BEGIN IMMEDIATE; {script} PRAGMA user_version = {number}; COMMIT;"
+                )
+                print(f"Applied database migration {number}")
+            except sqlite3.Error as e:
+                self.connection.rollback()
+                print(f"Error applying database migration {number}: {e}")
+                raise
 
     def select(self, table, columns="*", where=None, where_params=None):
         """
@@ -151,16 +690,13 @@ class DatabaseConnection:
 
         query = f"UPDATE {table} SET {set_clause} WHERE {where}"
 
-        cursor = self.connection.cursor()
         try:
-            cursor.execute(query, values)
-            self.commit()
+            cursor = self._execute_write(query, values)
+            cursor.close()
             return cursor.rowcount
         except sqlite3.Error as e:
             print(f"Error updating data: {e}")
             return 0
-        finally:
-            cursor.close()
 
     def delete(self, table, where, where_params):
         """
@@ -179,16 +715,130 @@ class DatabaseConnection:
 
         query = f"DELETE FROM {table} WHERE {where}"
 
-        cursor = self.connection.cursor()
         try:
-            cursor.execute(query, where_params)
-            self.commit()
+            cursor = self._execute_write(query, where_params)
+            cursor.close()
             return cursor.rowcount
         except sqlite3.Error as e:
             print(f"Error deleting data: {e}")
             return 0
-        finally:
+
+    def delete_many(self, table, columns, rows):
+        """
+        Delete the rows matching each tuple of values in a single transaction.
+
+        Parameters:
+        table (str): The name of the table.
+        columns (list): Column names compared for equality, in the same order as the values.
+        rows (iterable): Tuples of values identifying the rows to delete.
+
+        Returns:
+        int: Number of rows deleted (0 if the batch failed and was rolled back).
+        """
+        if not self.connection:
+            self.connect()
+
+        where = ' AND '.join(f"{column} = ?" for column in columns)
+        query = f"DELETE FROM {table} WHERE {where}"
+
+        try:
+            cursor = self._execute_write(query, list(rows), many=True)
             cursor.close()
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            self.connection.rollback()
+            print(f"Error deleting data: {e}")
+            return 0
+
+
+_db_executor = None
+_db_executor_lock = threading.Lock()
+
+
+def get_db_executor():
+    """Return the thread pool that runs database calls for AsyncDatabaseConnection."""
+    global _db_executor
+    with _db_executor_lock:
+        if _db_executor is None:
+            _db_executor = ThreadPoolExecutor(
+                max_workers=int(os.environ.get("DATABASE_POOL_SIZE", "5")),
+                thread_name_prefix="database"
+            )
+        return _db_executor
+
+
+def _call_with_connection(func, args, kwargs):
+    db = DatabaseConnection()
+    db.connect()
+    if db.connection is None:
+        raise sqlite3.OperationalError("No database connection available")
+    try:
+        return func(db, *args, **kwargs)
+    finally:
+        db.close()
+
+
+async def call_with_connection(func, *args, **kwargs):
+    """
+    Run func(db, *args, **kwargs) on the database thread pool with a connection held only for the call.
+
+    Checkout, call and checkin run as one task on the pool, so a task
+    waiting for a connection never keeps a thread from a task that would
+    give one back.
+
+    Raises:
+    sqlite3.OperationalError: If no pooled connection becomes available.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_db_executor(), _call_with_connection, func, args, kwargs)
+
+
+class AsyncDatabaseConnection:
+    """
+    Asyncio front end for DatabaseConnection.
+
+    Every call runs on the database thread pool, so async routes can await
+    queries without blocking the event loop. A pooled connection is checked
+    out for each call and given back when it returns (see
+    call_with_connection), so a request never holds one between queries or
+    while it waits for anything else.
+    """
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking callable on the database thread pool and await its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_db_executor(), functools.partial(func, *args, **kwargs))
+
+    async def call(self, func, *args, **kwargs):
+        """Run func(db, *args, **kwargs) with a DatabaseConnection checked out for this call."""
+        return await call_with_connection(func, *args, **kwargs)
+
+    async def connect(self):
+        """Nothing to do: connections are checked out per call."""
+
+    async def close(self):
+        """Nothing to do: connections are given back after each call."""
+
+    async def execute_query(self, query, params=None):
+        return await self.call(DatabaseConnection.execute_query, query, params)
+
+    async def insert(self, table, data):
+        return await self.call(DatabaseConnection.insert, table, data)
+
+    async def insert_many(self, table, columns, rows, ignore_conflicts=False):
+        return await self.call(DatabaseConnection.insert_many, table, columns, rows, ignore_conflicts)
+
+    async def select(self, table, columns="*", where=None, where_params=None):
+        return await self.call(DatabaseConnection.select, table, columns, where, where_params)
+
+    async def update(self, table, data, where, where_params):
+        return await self.call(DatabaseConnection.update, table, data, where, where_params)
+
+    async def delete(self, table, where, where_params):
+        return await self.call(DatabaseConnection.delete, table, where, where_params)
+
+    async def delete_many(self, table, columns, rows):
+        return await self.call(DatabaseConnection.delete_many, table, columns, rows)
 
 
 with DatabaseConnection() as db:
@@ -227,3 +877,5 @@ with DatabaseConnection() as db:
     );
     """
     db.execute_query(create_movements_categories_table_query)
+
+    db.migrate()
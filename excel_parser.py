@@ -0,0 +1,151 @@
+import io
+import itertools
+import os
+
+import openpyxl
+import pandas as pd
+import xlrd
+
+from bank_formats import detect_format
+
+# Statement rows converted to a DataFrame (and written to the database) at a time
+DEFAULT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "5000"))
+
+# Leading sheet rows searched for the header row
+HEADER_SEARCH_ROWS = 20
+
+# First bytes of the old binary .xls format (OLE2 compound file)
+XLS_SIGNATURE = b'\xd0\xcf\x11\xe0'
+
+
+def _is_xls(source):
+    """Whether a path or bytes holds an old .xls workbook (anything else is read as .xlsx)."""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source[:4]) == XLS_SIGNATURE
+    with open(source, 'rb') as f:
+        return f.read(4) == XLS_SIGNATURE
+
+
+def _select_sheet(names, has_rows):
+    """Pick the statement sheet: 'Listado', the only sheet, or the first one with data."""
+    if 'Listado' in names:
+        return 'Listado'
+    if len(names) == 1:
+        return names[0]
+    for name in names:
+        if has_rows(name):
+            return name
+    return None
+
+
+def _xls_value(cell, datemode):
+    """Convert an xlrd cell to the value pandas would read for it."""
+    if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+        return None
+    if cell.ctype == xlrd.XL_CELL_DATE:
+        return xlrd.xldate.xldate_as_datetime(cell.value, datemode)
+    if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+        return bool(cell.value)
+    return cell.value
+
+
+def iter_sheet_rows(source):
+    """
+    Yield the rows of the statement sheet as tuples, without loading the other sheets.
+
+    .xlsx files are streamed row by row with openpyxl's read-only mode;
+    .xls files are opened on demand so only the selected sheet is parsed.
+
+    Parameters:
+    source (str or bytes): Path to the workbook or its contents.
+
+    Raises:
+    ValueError: If the workbook has no sheet with data.
+    """
+    in_memory = isinstance(source, (bytes, bytearray))
+    if _is_xls(source):
+        book = xlrd.open_workbook(file_contents=source, on_demand=True) if in_memory else \
+            xlrd.open_workbook(source, on_demand=True)
+        try:
+            name = _select_sheet(book.sheet_names(), lambda n: book.sheet_by_name(n).nrows > 0)
+            if name is None:
+                raise ValueError("No valid sheet found in the Excel file")
+            sheet = book.sheet_by_name(name)
+            for index in range(sheet.nrows):
+                yield tuple(_xls_value(cell, book.datemode) for cell in sheet.row(index))
+        finally:
+            book.release_resources()
+    else:
+        workbook = openpyxl.load_workbook(io.BytesIO(source) if in_memory else source, read_only=True, data_only=True)
+        try:
+            def has_rows(name):
+                rows = workbook[name].iter_rows(max_row=HEADER_SEARCH_ROWS, values_only=True)
+                return any(value is not None for row in rows for value in row)
+
+            name = _select_sheet(workbook.sheetnames, has_rows)
+            if name is None:
+                raise ValueError("No valid sheet found in the Excel file")
+            yield from workbook[name].iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+
+def _batches(rows, columns, batch_size):
+    """Group data rows into DataFrames of at most batch_size rows, skipping empty rows."""
+    data_rows = (row for row in rows if any(value is not None and value != '' for value in row))
+    width = len(columns)
+    while True:
+        batch = [tuple(row[:width]) + (None,) * (width - len(row)) for row in itertools.islice(data_rows, batch_size)]
+        if not batch:
+            return
+        yield pd.DataFrame(batch, columns=columns)
+
+
+def read_statement(source, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Open a bank statement for streaming.
+
+    Only the rows needed to detect the format are read up front; the data
+    rows are read from the sheet as the batches are consumed, so memory use
+    depends on batch_size and not on the size of the file.
+
+    Parameters:
+    source (str or bytes): Path to the workbook or its contents.
+    batch_size (int): Rows per DataFrame batch.
+
+    Returns:
+    tuple: (format name in BANK_FORMATS, generator of DataFrames with the statement columns)
+
+    Raises:
+    ValueError: If the file is not a supported bank statement.
+    """
+    try:
+        rows = iter_sheet_rows(source)
+        head = list(itertools.islice(rows, HEADER_SEARCH_ROWS))
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Could not read the Excel file: {e}")
+
+    header_row, columns, format_type = detect_format(head)
+    return format_type, _batches(itertools.chain(head[header_row + 1:], rows), columns, batch_size)
+
+
+def process_excel_file(file_content: bytes):
+    """
+    Process uploaded Excel file and return DataFrame
+    """
+    try:
+        format_type, batches = read_statement(file_content)
+        frames = list(batches)
+
+        # Validate we have data rows
+        if not frames:
+            raise ValueError("No data rows found in the Excel file after processing")
+
+        df = pd.concat(frames, ignore_index=True)
+        return df, format_type
+
+    except Exception as e:
+        print(f"Error processing Excel file: {e}")
+        raise ValueError(f"Error processing Excel file: {str(e)}")
@@ -0,0 +1,110 @@
+import os
+import uuid
+from datetime import datetime
+
+from categorization_rules import apply_rules
+from database_connection import DatabaseConnection
+from excel_parser import DEFAULT_BATCH_SIZE
+from movement_importer import import_excel_file
+
+# Columns of the import_jobs table, in the order they are loaded
+JOB_COLUMNS = [
+    'id', 'filename', 'status', 'rows_processed', 'inserted', 'duplicates',
+    'errors', 'categorized', 'message', 'created_at', 'started_at', 'finished_at'
+]
+
+# Statuses of a job that will not change any more
+FINISHED_STATUSES = ('done', 'failed')
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def create_job(db, filename):
+    """
+    Record a new queued import job.
+
+    Returns:
+    str: The job id.
+    """
+    job_id = uuid.uuid4().hex
+    db.insert('import_jobs', {'id': job_id, 'filename': filename, 'status': 'queued', 'created_at': _now()})
+    return job_id
+
+
+def update_job(db, job_id, **fields):
+    """Update the given columns of a job."""
+    db.update('import_jobs', fields, 'id = ?', (job_id,))
+
+
+def get_job(db, job_id):
+    """
+    Load a job.
+
+    Returns:
+    dict: The job with the JOB_COLUMNS keys, or None if it doesn't exist.
+    """
+    rows = db.execute_query(f"SELECT {', '.join(JOB_COLUMNS)} FROM import_jobs WHERE id = ?", (job_id,))
+    return dict(zip(JOB_COLUMNS, rows[0])) if rows else None
+
+
+def list_jobs(db, limit=20):
+    """Load the most recent jobs, newest first."""
+    rows = db.execute_query(
+        f"SELECT {', '.join(JOB_COLUMNS)} FROM import_jobs ORDER BY created_at DESC, rowid DESC LIMIT ?",
+        (limit,)
+    )
+    return [dict(zip(JOB_COLUMNS, row)) for row in rows]
+
+
+def fail_interrupted_jobs(db):
+    """
+    Mark jobs left queued or running by a previous run of the app as failed.
+
+    Returns:
+    int: Number of jobs marked.
+    """
+    return db.update(
+        'import_jobs',
+        {'status': 'failed', 'message': 'Import interrupted by a restart', 'finished_at': _now()},
+        "status IN ('queued', 'running')",
+        ()
+    )
+
+
+def run_import_job(job_id, path, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Import a spooled statement file for a job, recording its progress.
+
+    Runs in a worker process: the job row is updated after every batch so
+    any process can follow it, the new movements are categorized with the
+    rules at the end, and the spooled file is removed.
+
+    Parameters:
+    job_id (str): The job created for the file.
+    path (str): Path to the spooled .xls/.xlsx file.
+    batch_size (int): Rows per batch.
+
+    Returns:
+    dict: The finished job.
+    """
+    with DatabaseConnection() as db:
+        update_job(db, job_id, status='running', started_at=_now())
+        try:
+            result = import_excel_file(path, batch_size, on_batch=lambda progress: update_job(db, job_id, **progress))
+            # Only the movements this file inserted, not the ones other imports write meanwhile
+            categorized = apply_rules(db, movement_ids=result['ids'])['categorized'] if result['ids'] else 0
+            update_job(db, job_id, status='done', categorized=categorized, finished_at=_now())
+        except ValueError as e:
+            error_msg = str(e).replace("Error processing Excel file: ", "")
+            update_job(db, job_id, status='failed', message=f"File processing error: {error_msg}", finished_at=_now())
+        except Exception as e:
+            print(f"Unexpected error importing file: {e}")
+            update_job(
+                db, job_id, status='failed', finished_at=_now(),
+                message="An unexpected error occurred while processing the file"
+            )
+        finally:
+            os.remove(path)
+        return get_job(db, job_id)
@@ -1,32 +1,21 @@
-from database_connection import DatabaseConnection
-from read_file import read_file
-
+import sys
 
+from database_connection import DatabaseConnection
+from movement_importer import write_movements
+from read_file import read_movements
 
 
-# with DatabaseConnection() as db:
-#     movimientos_file = 'movimientos/movimientos.xls'
-#     df = read_file(movimientos_file)
-    
-#     if df is not None:
-#         # Insert data into the database
-#         for index, row in df['Listado'].iterrows():
-#             insert_query = """
-#             INSERT INTO movimientos (fecha, fecha_valor, descripcion, importe, saldo)
-#             VALUES (?, ?, ?, ?, ?);
-#             """
-#             db.insert('movimientos', {
-#                 'fecha': row['data'].replace('/', '-'),
-#                 'fecha_valor': row['balio-data'].replace('/', '-'),
-#                 'descripcion': row['azalpena'],
-#                 'importe': row['eragiketaren zenbatekoa'],
-#                 'saldo': row['saldoa']
-#             })
-        
-#         db.commit()
-#         print("Movements data inserted successfully.")
-#     else:
-#         print("Failed to read the file.")
+# importar un extracto: python main.py movimientos/movimientos.xls
+if len(sys.argv) > 1:
+    result = read_movements(sys.argv[1])
+    if result is not None:
+        movements, errors = result
+        with DatabaseConnection() as db:
+            inserted = len(write_movements(db, movements))
+        print(f"Movements data inserted successfully: {inserted} new, "
+              f"{len(movements) - inserted} duplicates, {errors} invalid rows.")
+    else:
+        print("Failed to read the file.")
 
 with DatabaseConnection() as db:
     # ver movimentos de marzo
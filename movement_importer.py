@@ -0,0 +1,100 @@
+from database_connection import DatabaseConnection
+from excel_parser import DEFAULT_BATCH_SIZE, read_statement
+from normalization import normalize_movements
+
+# Columns of the movimientos table filled by an import, in insert order
+MOVEMENT_COLUMNS = ['fecha', 'fecha_valor', 'descripcion', 'importe', 'saldo']
+
+# Natural key used to detect movements that were already imported
+MOVEMENT_KEY = ['fecha', 'descripcion', 'importe', 'saldo']
+
+
+def write_movements(db, movements):
+    """
+    Insert normalized movements with a single executemany transaction.
+
+    Movements already in the database are skipped by the unique index on MOVEMENT_KEY.
+
+    Parameters:
+    db (DatabaseConnection): An open database connection.
+    movements (pd.DataFrame): Rows with MOVEMENT_COLUMNS, as returned by normalize_movements.
+
+    Returns:
+    list: Ids of the movements inserted.
+    """
+    rows = movements[MOVEMENT_COLUMNS].astype(object).where(movements.notna(), None)
+    return db.insert_many_ids(
+        'movimientos',
+        MOVEMENT_COLUMNS,
+        rows.itertuples(index=False, name=None),
+        ignore_conflicts=True
+    )
+
+
+def import_movements(db, df, format_type):
+    """
+    Import a parsed bank statement into the movimientos table.
+
+    Rows are normalized column-wise and written with a single executemany
+    transaction. Duplicates (within the file and against the database) are
+    skipped by the unique index on MOVEMENT_KEY.
+
+    Parameters:
+    db (DatabaseConnection): An open database connection.
+    df (pd.DataFrame): Statement rows as returned by process_excel_file.
+    format_type (str): Name of the format in BANK_FORMATS.
+
+    Returns:
+    dict: Counts of 'inserted', 'duplicates' and 'errors' rows, and the
+    'ids' of the inserted movements.
+    """
+    movements, error_count = normalize_movements(df, format_type)
+    if movements.empty:
+        return {'inserted': 0, 'duplicates': 0, 'errors': error_count, 'ids': []}
+
+    ids = write_movements(db, movements)
+    duplicate_count = len(movements) - len(ids)
+    print(f"Imported {len(ids)} movements ({duplicate_count} duplicates, {error_count} errors)")
+    return {'inserted': len(ids), 'duplicates': duplicate_count, 'errors': error_count, 'ids': ids}
+
+
+def import_excel_file(path, batch_size=DEFAULT_BATCH_SIZE, on_batch=None):
+    """
+    Stream a bank statement file into the movimientos table in fixed-size batches.
+
+    The sheet is read row by row and each batch is normalized and written
+    in its own transaction, so memory use is bounded by batch_size however
+    large the file is. Opens its own database connection, so it can run in
+    a worker process.
+
+    Parameters:
+    path (str): Path to the .xls/.xlsx file.
+    batch_size (int): Rows per batch.
+    on_batch (callable, optional): Called after each batch with the running
+        counts ('rows_processed', 'inserted', 'duplicates', 'errors').
+
+    Returns:
+    dict: Counts of 'inserted', 'duplicates' and 'errors' rows, and the
+    'ids' of the inserted movements.
+
+    Raises:
+    ValueError: If the file is not a supported bank statement or has no data rows.
+    """
+    format_type, batches = read_statement(path, batch_size)
+
+    totals = {'inserted': 0, 'duplicates': 0, 'errors': 0}
+    ids = []
+    rows = 0
+    with DatabaseConnection() as db:
+        for batch in batches:
+            rows += len(batch)
+            result = import_movements(db, batch, format_type)
+            for key in totals:
+                totals[key] += result[key]
+            ids.extend(result['ids'])
+            if on_batch is not None:
+                on_batch({'rows_processed': rows, **totals})
+
+    if rows == 0:
+        raise ValueError("No data rows found in the Excel file after processing")
+    return {**totals, 'ids': ids}
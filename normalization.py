@@ -0,0 +1,124 @@
+import pandas as pd
+
+from bank_formats import BANK_FORMATS
+
+# Excel stores dates as days since 1899-12-30; numbers in this range
+# (1954-09-26 to 2119-01-16) are read as dates rather than rejected
+EXCEL_EPOCH = '1899-12-30'
+EXCEL_SERIAL_RANGE = (20000, 80000)
+
+
+def normalize_dates(series, date_format):
+    """
+    Convert a whole column of dates to 'YYYY-MM-DD' strings.
+
+    Text is parsed with the bank's date format and retried as ISO dates,
+    Excel serial numbers are converted from the 1900 date system, and
+    datetime cells are kept as they are.
+
+    Parameters:
+    series (pd.Series): Raw date cells.
+    date_format (str): strftime format of dates written as text, e.g. '%d/%m/%Y'.
+
+    Returns:
+    tuple: (dates as strings with NaN where missing or invalid, mask of values that could not be converted)
+    """
+    serial = pd.to_numeric(series, errors='coerce')
+    is_serial = serial.between(*EXCEL_SERIAL_RANGE)
+
+    parsed = pd.to_datetime(series.where(~is_serial), format=date_format, errors='coerce')
+    if is_serial.any():
+        parsed[is_serial] = pd.to_datetime(serial[is_serial], unit='D', origin=EXCEL_EPOCH).dt.floor('D')
+    retry = parsed.isna() & series.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(series[retry].astype(str), format='ISO8601', errors='coerce')
+
+    invalid = parsed.isna() & series.notna()
+    return parsed.dt.strftime('%Y-%m-%d'), invalid
+
+
+def normalize_amounts(series, decimal=','):
+    """
+    Convert a whole column of amounts to floats.
+
+    Cells that are already numbers are kept as they are. Text cells are
+    read with thousands grouping only where they match it ('1.234,56' or
+    '1.500' with decimal ','); any other separator is read as the decimal
+    point, so '-25.50' is -25.5 whichever decimal the bank format declares.
+    A single group like '2.345' is read as a decimal number when the other
+    cells of the column use that separator as the decimal point.
+
+    Parameters:
+    series (pd.Series): Raw amount cells.
+    decimal (str): Decimal separator of amounts written as text ('.' or ',').
+
+    Returns:
+    tuple: (amounts with missing values as 0.0, mask of values that could not be converted)
+    """
+    is_text = series.map(lambda value: isinstance(value, str))
+    amounts = pd.to_numeric(series.where(~is_text), errors='coerce')
+    if is_text.any():
+        text = series[is_text].str.strip()
+        group = '.' if decimal == ',' else ','
+        grouped = text.str.fullmatch(rf"-?\d{{1,3}}(?:\{group}\d{{3}})+(?:\{decimal}\d+)?")
+        single_group = text.str.fullmatch(rf"-?\d{{1,3}}\{group}\d{{3}}")
+        group_as_decimal = ~grouped & text.str.contains(group, regex=False) & ~text.str.contains(decimal, regex=False)
+        if group_as_decimal.any() and not text.str.contains(decimal, regex=False).any():
+            grouped &= ~single_group
+        text = text.where(~grouped, text.str.replace(group, '', regex=False))
+        amounts[is_text] = pd.to_numeric(text.str.replace(',', '.', regex=False), errors='coerce')
+    invalid = amounts.isna() & series.notna()
+    return amounts.fillna(0.0).astype(float), invalid
+
+
+def normalize_statement(df, format_type):
+    """
+    Convert every row of a parsed bank statement to movimientos columns.
+
+    Parameters:
+    df (pd.DataFrame): Statement rows with the bank's column names.
+    format_type (str): Name of the format in BANK_FORMATS.
+
+    Returns:
+    tuple: (DataFrame with fecha, fecha_valor, descripcion, importe and saldo
+    for all rows, mask of the rows that can't be imported)
+    """
+    bank_format = BANK_FORMATS[format_type]
+    columns = bank_format['columns']
+
+    descripcion = df[columns['descripcion']]
+    fecha, bad_fecha = normalize_dates(df[columns['fecha']], bank_format['date_format'])
+    fecha_valor, _ = normalize_dates(df[columns['fecha_valor']], bank_format['date_format'])
+    importe, bad_importe = normalize_amounts(df[columns['importe']], bank_format['decimal'])
+    saldo, bad_saldo = normalize_amounts(df[columns['saldo']], bank_format['decimal'])
+
+    movements = pd.DataFrame({
+        'fecha': fecha,
+        'fecha_valor': fecha_valor,
+        'descripcion': descripcion.where(descripcion.isna(), descripcion.astype(str).str.strip()),
+        'importe': importe,
+        'saldo': saldo,
+    })
+
+    invalid = (
+        bad_fecha | bad_importe | bad_saldo
+        | movements['fecha'].isna()
+        | movements['descripcion'].isna()
+        | (movements['descripcion'] == '')
+    )
+    return movements, invalid
+
+
+def normalize_movements(df, format_type):
+    """
+    Normalize a parsed bank statement into rows of the movimientos table.
+
+    Parameters:
+    df (pd.DataFrame): Statement rows as returned by read_statement.
+    format_type (str): Name of the format in BANK_FORMATS.
+
+    Returns:
+    tuple: (DataFrame with the valid rows, number of invalid rows)
+    """
+    movements, invalid = normalize_statement(df, format_type)
+    return movements[~invalid].reset_index(drop=True), int(invalid.sum())
@@ -1,5 +1,8 @@
 import pandas as pd
 
+from excel_parser import read_statement
+from normalization import normalize_movements
+
 def read_file(file_path):
     """
     Reads a CSV file and returns a DataFrame.
@@ -30,11 +33,40 @@ def read_file(file_path):
     except Exception as e:
         print(f"Error reading the file: {e}")
         return None
-    
+
+
+def read_movements(file_path):
+    """
+    Reads a bank statement and returns its movements ready for the movimientos table.
+
+    Parameters:
+    file_path (str): The path to the .xls/.xlsx file.
+
+    Returns:
+    tuple: (DataFrame with fecha, fecha_valor, descripcion, importe and saldo, number of invalid rows),
+    or None if the file can't be read.
+    """
+    try:
+        format_type, batches = read_statement(file_path)
+        frames, error_count = [], 0
+        for batch in batches:
+            movements, errors = normalize_movements(batch, format_type)
+            frames.append(movements)
+            error_count += errors
+        if not frames:
+            raise ValueError("No data rows found in the Excel file")
+        return pd.concat(frames, ignore_index=True), error_count
+    except Exception as e:
+        print(f"Error reading the file: {e}")
+        return None
+
+
 if __name__ == "__main__":
     movimientos_file = 'movimientos/movimientos.xls'
-    df = read_file(movimientos_file)
-    if df is not None:
-        print(df['Listado'].head())
+    result = read_movements(movimientos_file)
+    if result is not None:
+        movements, errors = result
+        print(movements.head())
+        print(f"{len(movements)} movements, {errors} invalid rows")
     else:
         print("Failed to read the file.")
\ No newline at end of file
@@ -0,0 +1,151 @@
+import sqlite3
+from datetime import date
+
+from database_connection import REBUILD_MONTHLY_TOTALS_SQL, DatabaseConnection
+
+
+def rebuild_monthly_totals(db):
+    """
+    Recompute the monthly_category_totals rollup from movimientos and movements_categories.
+
+    The triggers keep the rollup up to date on every write; this is only
+    needed to repair it, e.g. after editing the database by hand.
+    """
+    if not db.connection:
+        db.connect()
+    try:
+        # The rebuilt totals differ from the cached ones if the rollup had drifted
+        db.connection.executescript(
+            f"BEGIN IMMEDIATE; {REBUILD_MONTHLY_TOTALS_SQL} "
+            "UPDATE data_generation SET generation = generation + 1 WHERE id = 1; COMMIT;"
+        )
+    except sqlite3.Error as e:
+        db.connection.rollback()
+        print(f"Error rebuilding monthly totals: {e}")
+        return 0
+    return db.execute_query("SELECT COUNT(*) FROM monthly_category_totals")[0][0]
+
+
+def month_range(month):
+    """
+    Return the date bounds of a month.
+
+    Parameters:
+    month (str): The month in 'YYYY-MM' format.
+
+    Returns:
+    tuple: ('YYYY-MM-01' of the month, 'YYYY-MM-01' of the following month).
+
+    Raises:
+    ValueError: If month is not a valid 'YYYY-MM' string.
+    """
+    try:
+        year, month_number = (int(part) for part in month.split('-'))
+        start = date(year, month_number, 1)
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError(f"Invalid month '{month}', expected format YYYY-MM")
+    if month_number == 12:
+        end = date(year + 1, 1, 1)
+    else:
+        end = date(year, month_number + 1, 1)
+    return start.isoformat(), end.isoformat()
+
+
+def fetch_monthly_category_totals(db, month=None):
+    """
+    Read the per-category totals of a month (or of the whole history) from the rollup.
+
+    Parameters:
+    db (DatabaseConnection): An open database connection.
+    month (str, optional): Month in 'YYYY-MM' format.
+
+    Returns:
+    list: (category_id or None for uncategorized, category name or None, spent, received, count) tuples.
+
+    Raises:
+    ValueError: If month is not a valid 'YYYY-MM' string.
+    """
+    query = """
+        SELECT c.id, c.name, ROUND(SUM(t.spent), 2), ROUND(SUM(t.received), 2), SUM(t.count)
+        FROM monthly_category_totals t
+        LEFT JOIN categories c ON c.id = t.category_id
+        WHERE t.count > 0
+    """
+    params = []
+    if month:
+        # Rollup keys are zero-padded, while month_range also accepts '2024-1'
+        query += " AND t.month = ?"
+        params.append(month_range(month)[0][:7])
+    query += " GROUP BY t.category_id ORDER BY c.name"
+    return [tuple(row) for row in db.execute_query(query, params)]
+
+
+# SQL expression grouping rollup months into each reporting period
+PERIOD_EXPRESSIONS = {
+    'month': "t.month",
+    'quarter': "substr(t.month, 1, 4) || '-Q' || ((CAST(substr(t.month, 6, 2) AS INTEGER) + 2) / 3)",
+    'year': "substr(t.month, 1, 4)",
+}
+
+
+def fetch_category_report_range(db, start_month=None, end_month=None, granularity='month', category_id=None):
+    """
+    Build a per-category time series from the rollup in a single query.
+
+    Parameters:
+    db (DatabaseConnection): An open database connection.
+    start_month (str, optional): First month included, in 'YYYY-MM' format.
+    end_month (str, optional): Last month included, in 'YYYY-MM' format.
+    granularity (str): 'month', 'quarter' (periods like '2025-Q3') or 'year'.
+    category_id (int, optional): Only this category (0 for uncategorized movements).
+
+    Returns:
+    list: One dict per (period, category) with 'period', 'id', 'name',
+    'spent', 'received', 'total' and 'count', ordered by period and name.
+
+    Raises:
+    ValueError: If a month or the granularity is not valid.
+    """
+    if granularity not in PERIOD_EXPRESSIONS:
+        raise ValueError(f"Invalid granularity '{granularity}', expected one of: {', '.join(PERIOD_EXPRESSIONS)}")
+    start_month = month_range(start_month)[0][:7] if start_month else None
+    end_month = month_range(end_month)[0][:7] if end_month else None
+
+    period = PERIOD_EXPRESSIONS[granularity]
+    query = f"""
+        SELECT {period} AS period, c.id, c.name,
+               ROUND(SUM(t.spent), 2), ROUND(SUM(t.received), 2), SUM(t.count)
+        FROM monthly_category_totals t
+        LEFT JOIN categories c ON c.id = t.category_id
+        WHERE t.count > 0
+    """
+    params = []
+    if start_month:
+        query += " AND t.month >= ?"
+        params.append(start_month)
+    if end_month:
+        query += " AND t.month <= ?"
+        params.append(end_month)
+    if category_id is not None:
+        query += " AND t.category_id = ?"
+        params.append(category_id)
+    query += " GROUP BY period, t.category_id ORDER BY period, c.name"
+
+    return [
+        {
+            'period': row[0],
+            'id': row[1],
+            'name': row[2],
+            'spent': row[3],
+            'received': row[4],
+            'total': round(row[4] - row[3], 2),
+            'count': row[5],
+        }
+        for row in db.execute_query(query, params)
+    ]
+
+
+if __name__ == "__main__":
+    with DatabaseConnection() as db:
+        rows = rebuild_monthly_totals(db)
+        print(f"Rebuilt monthly_category_totals: {rows} rows")
@@ -0,0 +1,415 @@
+import heapq
+import threading
+from collections import defaultdict
+from datetime import date, datetime
+from difflib import SequenceMatcher
+
+import numpy as np
+
+from transaction_queries import fetch_categories_by_movement
+
+# Size of the character n-grams used to find candidate descriptions
+NGRAM_SIZE = 3
+
+# Movements sharing the most n-grams with the query, scored first in a top-k search
+SEED_CANDIDATES = 50
+
+# Character buckets of the description histograms (ASCII maps one-to-one)
+CHAR_BUCKETS = 128
+
+
+def normalize_description(description):
+    """Lowercase a description and collapse its whitespace."""
+    return ' '.join(str(description).lower().split())
+
+
+def description_ngrams(description):
+    """Return the set of character n-grams of a normalized description."""
+    padded = f" {description} "
+    return {padded[i:i + NGRAM_SIZE] for i in range(max(1, len(padded) - NGRAM_SIZE + 1))}
+
+
+def char_histogram(text):
+    """Count the characters of a text into CHAR_BUCKETS buckets."""
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32) % CHAR_BUCKETS
+    return np.bincount(codes, minlength=CHAR_BUCKETS).astype(np.int32)
+
+
+def one_year_before(day):
+    """Same day one year earlier, as SQLite's date(day, '-1 year') computes it (29 Feb -> 1 Mar)."""
+    try:
+        return day.replace(year=day.year - 1)
+    except ValueError:
+        return date(day.year - 1, 3, 1)
+
+
+def _parse_fecha(fecha):
+    """The date of a stored fecha, or None if it isn't a valid 'YYYY-MM-DD' date."""
+    try:
+        return datetime.strptime(str(fecha)[:10], '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+class SimilarityIndex:
+    """
+    In-memory search index over every movement.
+
+    Descriptions are normalized once and indexed by character n-grams in an
+    inverted index; their character counts, amounts and date features are
+    kept in NumPy arrays. A search computes the amount and date similarities
+    and an upper bound of the description similarity for the whole window
+    at once, and only runs SequenceMatcher on the movements whose bound can
+    still reach the results, so it returns the same movements as scoring
+    every one of them.
+    """
+
+    def __init__(self, rows):
+        """
+        Parameters:
+        rows (list): (id, fecha, descripcion, importe) tuples. Movements
+            whose fecha is not a 'YYYY-MM-DD' date are left out of the index.
+        """
+        dates = [_parse_fecha(row[1]) for row in rows]
+        skipped = [row[0] for row, day in zip(rows, dates) if day is None]
+        if skipped:
+            print(f"Similarity index skipped {len(skipped)} movements with an invalid date (ids {skipped[:10]})")
+            rows = [row for row, day in zip(rows, dates) if day is not None]
+            dates = [day for day in dates if day is not None]
+
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.fechas = [row[1] for row in rows]
+        self.descriptions = [row[2] for row in rows]
+        self.lowered = [str(row[2]).lower() for row in rows]
+        self.normalized = [normalize_description(row[2]) for row in rows]
+        self.amounts = np.array([row[3] for row in rows], dtype=float)
+
+        self.ordinals = np.array([d.toordinal() for d in dates], dtype=np.int64)
+        self.weekdays = np.array([d.weekday() for d in dates], dtype=np.int64)
+        self.days = np.array([d.day for d in dates], dtype=np.int64)
+        self.yeardays = np.array([d.timetuple().tm_yday for d in dates], dtype=np.int64)
+
+        self.lengths = np.array([len(text) for text in self.lowered], dtype=np.int64)
+        self.char_counts = np.zeros((len(rows), CHAR_BUCKETS), dtype=np.int32)
+        for position, text in enumerate(self.lowered):
+            self.char_counts[position] = char_histogram(text)
+
+        postings = defaultdict(list)
+        for position, description in enumerate(self.normalized):
+            for ngram in description_ngrams(description):
+                postings[ngram].append(position)
+        self.postings = {ngram: np.array(positions, dtype=np.int64) for ngram, positions in postings.items()}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def window(self, search_date):
+        """Positions of the movements in the year up to search_date (both ends included)."""
+        start = one_year_before(search_date).toordinal()
+        return np.flatnonzero((self.ordinals >= start) & (self.ordinals <= search_date.toordinal()))
+
+    def candidates(self, description, positions, limit):
+        """
+        Pick the positions whose descriptions share the most n-grams with the query.
+
+        Parameters:
+        description (str): Normalized query description.
+        positions (np.ndarray): Positions eligible for the search.
+        limit (int): Maximum number of candidates.
+
+        Returns:
+        np.ndarray: Candidate positions.
+        """
+        overlap = np.zeros(len(self), dtype=np.int64)
+        for ngram in description_ngrams(description):
+            posting = self.postings.get(ngram)
+            if posting is not None:
+                overlap[posting] += 1
+
+        matching = positions[overlap[positions] > 0]
+        if len(matching) <= limit:
+            return matching
+        best = np.argpartition(-overlap[matching], limit - 1)[:limit]
+        return matching[best]
+
+    def numeric_similarity(self, amount, search_date, positions):
+        """
+        Amount and date similarities of a query to the given positions, as in score_transaction.
+
+        Returns:
+        tuple: (amount similarity, date similarity) arrays.
+        """
+        amounts = self.amounts[positions]
+        largest = np.maximum(abs(amount), np.abs(amounts))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            amount_similarity = np.where(largest > 0, 1 - np.abs(amount - amounts) / largest, 1.0)
+
+        search_yday = search_date.timetuple().tm_yday
+        day_of_week_similarity = (self.weekdays[positions] == search_date.weekday()).astype(float)
+        day_of_month_similarity = 1 - np.abs(self.days[positions] - search_date.day) / 30
+        day_of_year_similarity = 1 - np.abs(self.yeardays[positions] - search_yday) / 365
+        date_similarity = (day_of_week_similarity + day_of_month_similarity + day_of_year_similarity) / 3
+
+        return amount_similarity, date_similarity
+
+    def description_bound(self, description, positions):
+        """
+        Upper bound of SequenceMatcher(None, description, ...).ratio() for the given positions.
+
+        This is SequenceMatcher.quick_ratio computed on bucketed character
+        counts for all positions at once; merging characters into buckets can
+        only raise the bound.
+        """
+        common = np.minimum(self.char_counts[positions], char_histogram(description)).sum(axis=1)
+        total = self.lengths[positions] + len(description)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(total > 0, 2.0 * common / total, 1.0)
+
+    def position(self, movement_id):
+        """Position of a movement in the index, or None if it isn't indexed."""
+        position = int(np.searchsorted(self.ids, movement_id))
+        if position < len(self.ids) and self.ids[position] == movement_id:
+            return position
+        return None
+
+    def search(self, description, amount, date_str, threshold=0.8, top_k=None, exclude=None):
+        """
+        Find the movements most similar to a description, amount and date.
+
+        Parameters:
+        description (str): The description to compare.
+        amount (float): The amount to compare.
+        date_str (str): The date to compare ('YYYY-MM-DD'); only the year before it is searched.
+        threshold (float): Minimum similarity, ignored when top_k is given.
+        top_k (int, optional): Number of movements to return.
+        exclude (int, optional): Position of a movement to leave out of the results.
+
+        Returns:
+        list: (position, similarity) pairs, most similar first.
+        """
+        search_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        query = description.lower()
+        window = self.window(search_date)
+        if exclude is not None:
+            window = window[window != exclude]
+        if len(window) == 0:
+            return []
+
+        amount_similarity, date_similarity = self.numeric_similarity(amount, search_date, window)
+        bound = (self.description_bound(query, window) + amount_similarity + date_similarity) / 3
+
+        def score(local):
+            desc_similarity = SequenceMatcher(None, query, self.lowered[window[local]]).ratio()
+            return (desc_similarity + amount_similarity[local] + date_similarity[local]) / 3
+
+        scored = {}
+        if top_k is None:
+            for local in np.flatnonzero(bound >= threshold):
+                similarity = score(local)
+                if similarity >= threshold:
+                    scored[int(local)] = similarity
+        else:
+            k = int(top_k)
+            best = []  # min-heap with the k best similarities found so far
+
+            def add(local):
+                similarity = score(local)
+                scored[int(local)] = similarity
+                if len(best) < k:
+                    heapq.heappush(best, similarity)
+                elif similarity > best[0]:
+                    heapq.heapreplace(best, similarity)
+
+            # Movements sharing the most n-grams are scored first so the k-th
+            # best similarity is high early and prunes most of the window
+            seed = self.candidates(normalize_description(description), window, max(k, SEED_CANDIDATES))
+            for local in np.searchsorted(window, seed):
+                add(local)
+            for local in np.argsort(-bound, kind='stable'):
+                if len(best) == k and bound[local] < best[0]:
+                    break
+                if int(local) not in scored:
+                    add(local)
+
+        ranked = sorted(scored.items(), key=lambda item: (-item[1], item[0]))
+        if top_k is not None:
+            ranked = ranked[:int(top_k)]
+        return [(int(window[local]), float(similarity)) for local, similarity in ranked]
+
+
+_index_lock = threading.Lock()
+_index_cache = {'signature': None, 'index': None}
+
+
+def get_similarity_index(db):
+    """
+    Return the similarity index for the current movements, rebuilding it when they change.
+
+    Parameters:
+    db (DatabaseConnection): An open database connection.
+    """
+    signature = tuple(db.execute_query("SELECT MAX(id), COUNT(*) FROM movimientos")[0])
+    with _index_lock:
+        if _index_cache['signature'] != signature:
+            rows = db.execute_query(
+                "SELECT id, fecha, descripcion, importe FROM movimientos WHERE fecha IS NOT NULL ORDER BY id"
+            )
+            _index_cache['index'] = SimilarityIndex([tuple(row) for row in rows])
+            _index_cache['signature'] = signature
+        return _index_cache['index']
+
+
+def find_similar(db, description, amount, date_str, threshold=0.8, top_k=None):
+    """
+    Find similar movements with the similarity index.
+
+    Returns:
+    list: Movements ('id', 'fecha', 'descripcion', 'importe', 'categories',
+    'similarity'), most similar first.
+    """
+    index = get_similarity_index(db)
+    matches = index.search(description, amount, date_str, threshold, top_k)
+    categories = fetch_categories_by_movement(db, [int(index.ids[p]) for p, _ in matches])
+    return [_match(index, position, similarity, categories) for position, similarity in matches]
+
+
+def find_similar_batch(db, probes=None, movement_ids=None, threshold=0.8, top_k=None):
+    """
+    Find similar movements for many probes in one call.
+
+    Every probe is searched against the same index and the categories of
+    all the matches are loaded with a single query. A probe given by
+    movement id uses that movement's description, amount and date, and the
+    movement itself is left out of its matches.
+
+    Parameters:
+    db (DatabaseConnection): An open database connection.
+    probes (list, optional): (description, amount, date) tuples, dates as 'YYYY-MM-DD'.
+    movement_ids (list, optional): IDs of movements to use as probes.
+    threshold (float): Minimum similarity, ignored when top_k is given.
+    top_k (int, optional): Number of movements to return per probe.
+
+    Returns:
+    list: One dict per probe, in order ('description', 'amount', 'date',
+    'movement_id' for id probes, and 'matches' as returned by find_similar).
+
+    Raises:
+    ValueError: If a movement id doesn't exist or has no date.
+    """
+    index = get_similarity_index(db)
+
+    searches = []
+    for description, amount, date_str in probes or []:
+        searches.append(({'description': description, 'amount': amount, 'date': date_str}, None))
+
+    missing = []
+    for movement_id in movement_ids or []:
+        position = index.position(movement_id)
+        if position is None:
+            missing.append(movement_id)
+            continue
+        searches.append(({
+            'movement_id': int(movement_id),
+            'description': index.descriptions[position],
+            'amount': float(index.amounts[position]),
+            'date': str(index.fechas[position])[:10],
+        }, position))
+    if missing:
+        raise ValueError(f"Movements not found or without a valid date: {', '.join(str(m) for m in missing)}")
+
+    results = []
+    for probe, position in searches:
+        matches = index.search(probe['description'], probe['amount'], probe['date'], threshold, top_k, exclude=position)
+        results.append((probe, matches))
+
+    matched_ids = {int(index.ids[p]) for _, matches in results for p, _ in matches}
+    categories = fetch_categories_by_movement(db, sorted(matched_ids))
+    return [
+        {**probe, 'matches': [_match(index, p, similarity, categories) for p, similarity in matches]}
+        for probe, matches in results
+    ]
+
+
+def _match(index, position, similarity, categories):
+    """Turn an index position into a result dict, with the categories loaded by fetch_categories_by_movement."""
+    movement_id = int(index.ids[position])
+    return {
+        'id': movement_id,
+        'fecha': index.fechas[position],
+        'descripcion': index.descriptions[position],
+        'importe': float(index.amounts[position]),
+        'categories': [{'id': c['id'], 'name': c['name']} for c in categories[movement_id]],
+        'similarity': similarity
+    }
+
+
+def score_transaction(description, amount, search_date, trans):
+    """
+    Reference similarity between a query and one movement.
+
+    The description, amount and date similarities are averaged; the date
+    similarity itself averages day of week, day of month and day of year.
+    """
+    desc_similarity = SequenceMatcher(None, description.lower(), trans['descripcion'].lower()).ratio()
+
+    largest = max(abs(amount), abs(trans['importe']))
+    amount_similarity = 1 - abs(amount - trans['importe']) / largest if largest else 1.0
+
+    trans_date = datetime.strptime(trans['fecha'][:10], '%Y-%m-%d')
+
+    day_of_week_similarity = 1 if trans_date.weekday() == search_date.weekday() else 0
+    day_of_month_similarity = 1 - abs(trans_date.day - search_date.day) / 30
+    day_of_year_similarity = 1 - abs(trans_date.timetuple().tm_yday - search_date.timetuple().tm_yday) / 365
+
+    date_similarity = (day_of_week_similarity + day_of_month_similarity + day_of_year_similarity) / 3
+
+    return (desc_similarity + amount_similarity + date_similarity) / 3
+
+
+def find_similar_reference(db, description, amount, date_str, threshold=0.8, top_k=None):
+    """
+    Find similar movements by scoring every movement of the past year.
+
+    This is the original exhaustive search, kept to check the indexed
+    search against it.
+    """
+    query = """
+        SELECT
+            m.id, m.fecha, m.descripcion, m.importe,
+            c.id as category_id, c.name as category_name
+        FROM movimientos m
+        LEFT JOIN movements_categories mc ON m.id = mc.movement_id
+        LEFT JOIN categories c ON mc.category_id = c.id
+        WHERE m.fecha BETWEEN date(?, '-1 year') AND ?
+    """
+    transactions_data = db.execute_query(query, (date_str, date_str))
+
+    # Group the movements with their categories
+    transactions_dict = {}
+    for row in transactions_data:
+        trans_id = row[0]
+        if trans_id not in transactions_dict:
+            transactions_dict[trans_id] = {
+                'id': row[0],
+                'fecha': row[1],
+                'descripcion': row[2],
+                'importe': row[3],
+                'categories': []
+            }
+        if row[4] is not None:
+            transactions_dict[trans_id]['categories'].append({
+                'id': row[4],
+                'name': row[5]
+            })
+
+    search_date = datetime.strptime(date_str, '%Y-%m-%d')
+    similar_transactions = []
+    for trans in transactions_dict.values():
+        trans['similarity'] = score_transaction(description, amount, search_date, trans)
+        similar_transactions.append(trans)
+
+    similar_transactions.sort(key=lambda x: x['similarity'], reverse=True)
+
+    if top_k is not None:
+        return similar_transactions[:int(top_k)]
+    return [x for x in similar_transactions if x['similarity'] >= threshold]
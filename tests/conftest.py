@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Importing database_connection opens DATABASE_PATH, so point it at a scratch file
+os.environ.setdefault('DATABASE_PATH', os.path.join(tempfile.mkdtemp(), 'movimientos.db'))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
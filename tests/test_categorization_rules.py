@@ -0,0 +1,40 @@
+import pandas as pd
+
+from categorization_rules import RULE_COLUMNS, RuleMatcher
+
+
+def make_rule(rule_id, pattern, is_regex=False, **fields):
+    rule = dict.fromkeys(RULE_COLUMNS)
+    rule.update(id=rule_id, category_id=rule_id, pattern=pattern, is_regex=is_regex, priority=0, **fields)
+    return rule
+
+
+def movements(*descriptions):
+    return pd.DataFrame({
+        'fecha': ['2024-01-01'] * len(descriptions),
+        'descripcion': list(descriptions),
+        'importe': [-10.0] * len(descriptions),
+    })
+
+
+def test_backreference_rule_is_not_broken_by_the_combined_prefilter():
+    matcher = RuleMatcher([
+        make_rule(1, r'(pago|cobro) tarjeta', is_regex=True),
+        make_rule(2, 'mercadona'),
+        make_rule(3, r'ref (\d)\1', is_regex=True),
+    ])
+
+    assigned = matcher.match(movements(
+        'REF 77 transferencia', 'ref 78 transferencia', 'MERCADONA VALENCIA', 'Pago tarjeta gasolinera'
+    ))
+
+    assert assigned.tolist() == [2, -1, 1, 0]
+
+
+def test_first_matching_rule_wins():
+    matcher = RuleMatcher([
+        make_rule(1, 'bizum', sign='income'),
+        make_rule(2, 'bizum'),
+    ])
+
+    assert matcher.match(movements('Bizum de Ana')).tolist() == [1]
@@ -0,0 +1,35 @@
+import pandas as pd
+
+from normalization import normalize_amounts
+
+
+def test_comma_decimal_amounts_with_thousands_grouping():
+    series = pd.Series(['1.500', '1.500,00', '1.234.567,89', ' 3,25 ', 12.5, None, 'abc'], dtype=object)
+
+    amounts, invalid = normalize_amounts(series, decimal=',')
+
+    assert amounts.tolist() == [1500.0, 1500.0, 1234567.89, 3.25, 12.5, 0.0, 0.0]
+    assert invalid.tolist() == [False, False, False, False, False, False, True]
+
+
+def test_dot_decimal_text_in_a_comma_decimal_format_is_not_scaled():
+    series = pd.Series(['-25.50', '1000.00', '-2.345'], dtype=object)
+
+    amounts, invalid = normalize_amounts(series, decimal=',')
+
+    assert amounts.tolist() == [-25.5, 1000.0, -2.345]
+    assert not invalid.any()
+
+
+def test_malformed_amounts_are_flagged():
+    amounts, invalid = normalize_amounts(pd.Series(['1.50,00', '1,2,3']), decimal=',')
+
+    assert amounts.tolist() == [0.0, 0.0]
+    assert invalid.all()
+
+
+def test_dot_decimal_amounts_drop_comma_grouping():
+    amounts, invalid = normalize_amounts(pd.Series(['1,500.25', '3.5', 7]), decimal='.')
+
+    assert amounts.tolist() == [1500.25, 3.5, 7.0]
+    assert not invalid.any()
@@ -0,0 +1,257 @@
+from rollups import fetch_monthly_category_totals, month_range
+
+# Name the summaries give to movements without a category
+UNCATEGORIZED = 'Uncategorized'
+
+# Transactions per page in the paginated listings
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def month_filter(month, column="m.fecha"):
+    """
+    Build a WHERE clause selecting the rows of a month.
+
+    The date column is compared against a half-open range instead of being
+    wrapped in strftime, so SQLite can use the index on fecha.
+
+    Returns:
+    tuple: (clause, params).
+    """
+    start, end = month_range(month)
+    return f"{column} >= ? AND {column} < ?", [start, end]
+
+
+def transaction_filters(month=None, category_id=None):
+    """
+    Build the WHERE clauses shared by the transaction listings.
+
+    Parameters:
+    month (str, optional): Only transactions of this 'YYYY-MM' month.
+    category_id (int, optional): Only transactions in this category (ignored if not positive).
+
+    Returns:
+    tuple: (list of clauses to be joined with AND, list of params).
+    """
+    where_clauses = []
+    where_params = []
+    if month:
+        clause, params = month_filter(month)
+        where_clauses.append(clause)
+        where_params.extend(params)
+    if category_id and category_id > 0:
+        where_clauses.append("c.id = ?")
+        where_params.append(category_id)
+    return where_clauses, where_params
+
+
+def movement_filters(month=None, category_id=None):
+    """
+    Build WHERE clauses over movimientos m alone, without joining categories.
+
+    Same filters as transaction_filters, but the category condition is an
+    EXISTS subquery so each movement appears once.
+
+    Returns:
+    tuple: (list of clauses to be joined with AND, list of params).
+    """
+    where_clauses = []
+    where_params = []
+    if month:
+        clause, params = month_filter(month)
+        where_clauses.append(clause)
+        where_params.extend(params)
+    if category_id and category_id > 0:
+        where_clauses.append(
+            "EXISTS (SELECT 1 FROM movements_categories mc WHERE mc.movement_id = m.id AND mc.category_id = ?)"
+        )
+        where_params.append(category_id)
+    return where_clauses, where_params
+
+
+def fetch_categories_by_movement(db, movement_ids):
+    """
+    Load the categories of the given movements.
+
+    Returns:
+    dict: movement id -> list of {'id', 'name', 'description'} dicts.
+    """
+    categories = {movement_id: [] for movement_id in movement_ids}
+    if not movement_ids:
+        return categories
+    placeholders = ','.join(['?'] * len(movement_ids))
+    rows = db.execute_query(
+        f"""
+        SELECT mc.movement_id, c.id, c.name, c.description
+        FROM movements_categories mc
+        JOIN categories c ON mc.category_id = c.id
+        WHERE mc.movement_id IN ({placeholders})
+        ORDER BY mc.id
+        """,
+        list(movement_ids)
+    )
+    for row in rows:
+        categories[row[0]].append({'id': row[1], 'name': row[2], 'description': row[3]})
+    return categories
+
+
+def _fetch_transactions(db, where_clauses, where_params, limit=None):
+    """Load movements matching the clauses, newest first, with their categories."""
+    query = "SELECT m.id, m.fecha, m.fecha_valor, m.descripcion, m.importe, m.saldo FROM movimientos m"
+    if where_clauses:
+        query += " WHERE " + " AND ".join(where_clauses)
+    query += " ORDER BY m.fecha DESC, m.id DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        where_params = where_params + [limit]
+    rows = db.execute_query(query, where_params)
+
+    categories = fetch_categories_by_movement(db, [row[0] for row in rows])
+    return [
+        {
+            'id': row[0],
+            'fecha': row[1],
+            'fecha_valor': row[2],
+            'descripcion': row[3],
+            'importe': row[4],
+            'saldo': row[5],
+            'categories': categories[row[0]]
+        }
+        for row in rows
+    ]
+
+
+def fetch_transactions(db, month=None, category_id=None):
+    """
+    Fetch every transaction matching the filters, newest first.
+
+    Returns:
+    list: Transactions with their categories.
+    """
+    where_clauses, where_params = movement_filters(month, category_id)
+    return _fetch_transactions(db, where_clauses, where_params)
+
+
+def fetch_transactions_page(db, month=None, category_id=None, after=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Fetch one page of transactions, newest first, using a keyset cursor.
+
+    Parameters:
+    db (DatabaseConnection): An open database connection.
+    month (str, optional): Only transactions of this 'YYYY-MM' month.
+    category_id (int, optional): Only transactions in this category.
+    after (tuple, optional): (fecha, id) of the last transaction of the previous page.
+    page_size (int): Maximum number of transactions to return (capped at MAX_PAGE_SIZE).
+
+    Returns:
+    tuple: (list of transactions with their categories, (fecha, id) cursor of the next page or None).
+    """
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    where_clauses, where_params = movement_filters(month, category_id)
+    if after:
+        after_fecha, after_id = after
+        where_clauses.append("(m.fecha < ? OR (m.fecha = ? AND m.id < ?))")
+        where_params.extend([after_fecha, after_fecha, after_id])
+
+    # One extra row tells whether there is a next page
+    transactions = _fetch_transactions(db, where_clauses, where_params, limit=page_size + 1)
+    has_more = len(transactions) > page_size
+    transactions = transactions[:page_size]
+
+    next_cursor = (transactions[-1]['fecha'], transactions[-1]['id']) if has_more else None
+    return transactions, next_cursor
+
+
+def fetch_categories(db):
+    """
+    Load all categories ordered by name.
+
+    Returns:
+    list: {'id', 'name', 'description'} dicts.
+    """
+    rows = db.execute_query("SELECT id, name, description FROM categories")
+    categories = [{'id': row[0], 'name': row[1], 'description': row[2]} for row in rows]
+    categories.sort(key=lambda c: c['name'].lower())
+    return categories
+
+
+def fetch_category_breakdown(db, month=None, category_id=None):
+    """
+    Sum expenses and income per category straight from movimientos.
+
+    Returns:
+    list: (category name or None for uncategorized, spent, received) tuples.
+    """
+    where_clauses = []
+    where_params = []
+    if month:
+        clause, params = month_filter(month)
+        where_clauses.append(clause)
+        where_params.extend(params)
+    if category_id and category_id > 0:
+        where_clauses.append("c.id = ?")
+        where_params.append(category_id)
+    query = """
+        SELECT
+            c.name AS category_name,
+            SUM(CASE WHEN m.importe < 0 THEN -m.importe ELSE 0 END) AS spent,
+            SUM(CASE WHEN m.importe > 0 THEN m.importe ELSE 0 END) AS received
+        FROM movimientos m
+        LEFT JOIN (
+            SELECT DISTINCT mc.movement_id, c.id, c.name
+            FROM movements_categories mc
+            JOIN categories c ON mc.category_id = c.id
+        ) c ON c.movement_id = m.id
+    """
+    if where_clauses:
+        query += " WHERE " + " AND ".join(where_clauses)
+    query += " GROUP BY c.id"
+    return [tuple(row) for row in db.execute_query(query, where_params)]
+
+
+def fetch_summary(db, month=None, category_id=None):
+    """
+    Compute the dashboard totals with SQL aggregates.
+
+    Expenses and income are summed separately, both over the whole filter
+    and per category; movements without a category are reported under
+    'Uncategorized'. When filtering by category, only that category is
+    broken down.
+
+    Returns:
+    dict: 'total_spent' (negative), 'total_received', 'total_difference',
+    and 'category_totals' / 'category_gains_totals' mapping category names
+    to positive amounts.
+    """
+    where_clauses, where_params = movement_filters(month, category_id)
+    query = """
+        SELECT
+            COALESCE(SUM(CASE WHEN m.importe < 0 THEN m.importe END), 0) AS total_spent,
+            COALESCE(SUM(CASE WHEN m.importe > 0 THEN m.importe END), 0) AS total_received
+        FROM movimientos m
+    """
+    if where_clauses:
+        query += " WHERE " + " AND ".join(where_clauses)
+    total_spent, total_received = db.execute_query(query, where_params)[0]
+
+    category_totals = {}
+    category_gains_totals = {}
+    if category_id and category_id > 0:
+        rows = fetch_category_breakdown(db, month, category_id)
+    else:
+        # Without a category filter the breakdown is a lookup in the monthly rollup
+        rows = [(name, spent, received) for _, name, spent, received, _ in fetch_monthly_category_totals(db, month)]
+    for name, spent, received in rows:
+        name = name if name is not None else UNCATEGORIZED
+        if spent:
+            category_totals[name] = category_totals.get(name, 0) + spent
+        if received:
+            category_gains_totals[name] = category_gains_totals.get(name, 0) + received
+
+    return {
+        'total_spent': total_spent,
+        'total_received': total_received,
+        'total_difference': total_received + total_spent,  # spent is already negative
+        'category_totals': category_totals,
+        'category_gains_totals': category_gains_totals,
+    }
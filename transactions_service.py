@@ -0,0 +1,217 @@
+import functools
+import threading
+
+from category_tree import CategoryTree
+from transaction_queries import (
+    DEFAULT_PAGE_SIZE, UNCATEGORIZED, fetch_categories, fetch_summary, fetch_transactions, fetch_transactions_page
+)
+
+# Read results shared by the web app and the MCP server, keyed by database
+# file, function and arguments, and stamped with the data generation they
+# were computed at. Triggers move the generation on with every write from
+# any process, so stale entries are recomputed on their next read.
+MAX_CACHED_RESULTS = 256
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def cached(func):
+    """
+    Cache the results of a read function func(db, *args) until the database is written.
+
+    Cached results are shared between callers, so they must not be modified.
+    """
+    @functools.wraps(func)
+    def wrapper(db, *args, **kwargs):
+        key = (str(db.db_path), func.__name__, args, tuple(sorted(kwargs.items())))
+        version = db.write_version()
+        with _cache_lock:
+            entry = _cache.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+
+        result = func(db, *args, **kwargs)
+        if version is None:
+            return result
+        with _cache_lock:
+            if len(_cache) >= MAX_CACHED_RESULTS:
+                _cache.pop(next(iter(_cache)))
+            _cache[key] = (version, result)
+        return result
+    return wrapper
+
+
+@cached
+def load_transactions(db, month=None, category_id=None):
+    """
+    Every transaction matching the filters, newest first, with its categories.
+
+    Raises:
+    ValueError: If month is not a valid 'YYYY-MM' string.
+    """
+    return fetch_transactions(db, month, category_id)
+
+
+@cached
+def load_transactions_page(db, month=None, category_id=None, after=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    One page of transactions and the cursor of the next one (see fetch_transactions_page).
+
+    Raises:
+    ValueError: If month is not a valid 'YYYY-MM' string.
+    """
+    return fetch_transactions_page(db, month, category_id, after, page_size)
+
+
+@cached
+def load_summary(db, month=None, category_id=None):
+    """
+    Dashboard totals for the filters (see fetch_summary).
+
+    Raises:
+    ValueError: If month is not a valid 'YYYY-MM' string.
+    """
+    return fetch_summary(db, month, category_id)
+
+
+@cached
+def load_categories(db):
+    """All categories ordered by name."""
+    return fetch_categories(db)
+
+
+@cached
+def load_category_tree(db):
+    """The categories (and the uncategorized bucket) parsed into a CategoryTree."""
+    return CategoryTree([category['name'] for category in load_categories(db)] + [UNCATEGORIZED])
+
+
+@cached
+def load_category_levels(db, month=None, level=1):
+    """
+    Category totals rolled up to one level of the category hierarchy.
+
+    Parameters:
+    month (str, optional): Only movements of this 'YYYY-MM' month.
+    level (int): 1 for top-level categories ('gastos'), 2 for their children ('gastos/casa')...
+
+    Returns:
+    list: {'path', 'spent', 'received', 'total'} dicts, largest movement first.
+
+    Raises:
+    ValueError: If month is not a valid 'YYYY-MM' string or level is not positive.
+    """
+    if level < 1:
+        raise ValueError("level must be 1 or greater")
+    summary = load_summary(db, month)
+    tree = load_category_tree(db)
+    spent = tree.rollup_by_level(summary['category_totals'], level)
+    received = tree.rollup_by_level(summary['category_gains_totals'], level)
+    levels = [
+        {
+            'path': path,
+            'spent': round(spent.get(path, 0), 2),
+            'received': round(received.get(path, 0), 2),
+            'total': round(received.get(path, 0) - spent.get(path, 0), 2),
+        }
+        for path in set(spent) | set(received)
+    ]
+    levels.sort(key=lambda row: (-(row['spent'] + row['received']), row['path']))
+    return levels
+
+
+# Fields of the column-oriented payloads of the v1 API, in payload order
+TRANSACTION_FIELDS = ['id', 'fecha', 'fecha_valor', 'descripcion', 'importe', 'saldo', 'categories']
+SUMMARY_FIELDS = ['total_spent', 'total_received', 'total_difference', 'expenses', 'gains', 'expense_tree', 'gains_tree']
+
+
+def select_fields(fields, allowed):
+    """
+    Parse a comma-separated field selection.
+
+    Parameters:
+    fields (str, optional): e.g. 'id,fecha,importe'. All allowed fields if empty.
+    allowed (list): The fields that can be selected, in payload order.
+
+    Returns:
+    tuple: The selected fields, in payload order.
+
+    Raises:
+    ValueError: If a field is not allowed.
+    """
+    if not fields:
+        return tuple(allowed)
+    selected = {field.strip() for field in fields.split(',') if field.strip()}
+    unknown = selected.difference(allowed)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}. Available: {', '.join(allowed)}")
+    return tuple(field for field in allowed if field in selected)
+
+
+@cached
+def load_transactions_columns(db, month=None, category_id=None, after=None, page_size=DEFAULT_PAGE_SIZE,
+                              fields=tuple(TRANSACTION_FIELDS)):
+    """
+    One page of transactions as columns: a list of values per field instead of a dict per row.
+
+    Categories are given as lists of category ids, with each name sent once in 'category_names'.
+
+    Returns:
+    dict: 'fields', 'columns' (field -> list), 'category_names' (id -> name), 'count' and
+    'next_cursor' ({'fecha', 'id'} of the last row, or None on the last page).
+
+    Raises:
+    ValueError: If month is not a valid 'YYYY-MM' string.
+    """
+    transactions, next_cursor = load_transactions_page(db, month, category_id, after, page_size)
+    columns = {}
+    category_names = {}
+    for field in fields:
+        if field == 'categories':
+            columns[field] = [[category['id'] for category in t['categories']] for t in transactions]
+            for transaction in transactions:
+                for category in transaction['categories']:
+                    category_names[category['id']] = category['name']
+        else:
+            columns[field] = [transaction[field] for transaction in transactions]
+    return {
+        'fields': list(fields),
+        'columns': columns,
+        'category_names': category_names,
+        'count': len(transactions),
+        'next_cursor': {'fecha': next_cursor[0], 'id': next_cursor[1]} if next_cursor else None,
+    }
+
+
+def _breakdown_columns(totals):
+    names = sorted(totals, key=lambda name: -totals[name])
+    return {'names': names, 'totals': [round(totals[name], 2) for name in names]}
+
+
+@cached
+def load_summary_columns(db, month=None, category_id=None, fields=tuple(SUMMARY_FIELDS)):
+    """
+    Dashboard totals with the per-category breakdowns as parallel name/total lists, largest first.
+
+    Returns:
+    dict: The selected SUMMARY_FIELDS; 'expenses' and 'gains' are {'names', 'totals'},
+    'expense_tree' and 'gains_tree' the same amounts added up the category
+    hierarchy (see CategoryTree.columns).
+
+    Raises:
+    ValueError: If month is not a valid 'YYYY-MM' string.
+    """
+    summary = load_summary(db, month, category_id)
+    values = {
+        'total_spent': summary['total_spent'],
+        'total_received': summary['total_received'],
+        'total_difference': summary['total_difference'],
+        'expenses': _breakdown_columns(summary['category_totals']),
+        'gains': _breakdown_columns(summary['category_gains_totals']),
+    }
+    tree = load_category_tree(db) if {'expense_tree', 'gains_tree'} & set(fields) else None
+    if 'expense_tree' in fields:
+        values['expense_tree'] = tree.columns(summary['category_totals'])
+    if 'gains_tree' in fields:
+        values['gains_tree'] = tree.columns(summary['category_gains_totals'])
+    return {field: values[field] for field in fields}